@@ -0,0 +1,261 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class MockDremioCatalog:
+    """
+    Synthetic Dremio catalog with one source of PDSs and a number of spaces, each a folder tree of the given depth
+    and fan-out with a fixed number of views per folder. Every view depends on a PDS and, except the first view of a
+    folder, on the previous view in the same folder.
+    """
+
+    def __init__(self, spaces=2, depth=2, fan_out=2, views_per_folder=3, tables=10, reflections=5):
+        self.entities = {}
+        self.root = []
+        self.views = []
+        self.reflections = []
+        # Rows of sys.jobs_recent, empty as the synthetic catalog does not change while it is served
+        self.jobs_history = []
+        self.by_path = {}
+
+        source = self.add_container("source-0", "source", ["bench_lake"])
+        self.root.append({"id": "source-0", "path": ["bench_lake"], "type": "CONTAINER", "containerType": "SOURCE"})
+        self.tables = []
+        for i in range(tables):
+            table = self.add_dataset(source, f"pds-{i}", ["bench_lake", f"table_{i}"], "PROMOTED")
+            self.tables.append(table)
+
+        for s in range(spaces):
+            space_id = f"space-{s}"
+            space = self.add_container(space_id, "space", [f"BenchSpace{s}"])
+            self.root.append({"id": space_id, "path": [f"BenchSpace{s}"], "type": "CONTAINER", "containerType": "SPACE"})
+            self.fill_folder(space, depth, fan_out, views_per_folder)
+
+        for i, view in enumerate(self.views[:reflections]):
+            self.reflections.append({
+                "reflection_id": f"{i:08d}-refl", "reflection_name": f"raw_{i}", "type": "RAW",
+                "dataset_id": view["view_id"], "dataset_name": ".".join(view["path_list"]), "dataset_type": "VIRTUAL",
+                "display_columns": "id, value", "sort_columns": "", "partition_columns": "",
+                "dimensions": "", "measures": ""
+            })
+
+    def add_container(self, entity_id: str, entity_type: str, path: list) -> dict:
+        entity = {"id": entity_id, "entityType": entity_type, "path": path, "tag": "1", "children": []}
+        if entity_type in ["source", "space"]:
+            entity["name"] = path[0]
+        self.entities[entity_id] = entity
+        self.by_path[tuple(path)] = entity
+        return entity
+
+    def add_dataset(self, container: dict, entity_id: str, path: list, dataset_type: str, parents=()) -> dict:
+        child = {"id": entity_id, "path": path, "tag": "1", "type": "DATASET", "datasetType": dataset_type}
+        container["children"].append(child)
+        self.entities[entity_id] = {
+            "id": entity_id, "entityType": "dataset", "path": path, "tag": "1",
+            "type": "PHYSICAL_DATASET" if dataset_type == "PROMOTED" else "VIRTUAL_DATASET",
+            "parents": [{"id": p["id"], "path": p["path"], "datasetType": p["datasetType"]} for p in parents],
+            "fields": [{"name": "id", "type": {"name": "BIGINT"}}, {"name": "value", "type": {"name": "VARCHAR"}}]
+        }
+        self.by_path[tuple(path)] = self.entities[entity_id]
+        return child
+
+    def fill_folder(self, container: dict, depth: int, fan_out: int, views_per_folder: int):
+        previous = None
+        for v in range(views_per_folder):
+            n = len(self.views)
+            table = self.tables[n % len(self.tables)]
+            path = container["path"] + [f"view_{n}"]
+            parents = [table] if previous is None else [table, previous]
+            sql = f'SELECT * FROM "bench_lake"."{table["path"][1]}"'
+            if previous is not None:
+                sql += f' UNION ALL SELECT * FROM {".".join(previous["path"])}'
+            view = self.add_dataset(container, f"vds-{n}", path, "VIRTUAL", parents)
+            self.views.append({
+                "view_id": view["id"], "view_name": path[-1], "path": str(path), "path_list": path,
+                "sql_definition": sql, "sql_context": ""
+            })
+            previous = view
+        if depth == 0:
+            return
+        for f in range(fan_out):
+            folder_id = f"{container['id']}-{f}"
+            path = container["path"] + [f"folder_{f}"]
+            container["children"].append({"id": folder_id, "path": path, "type": "CONTAINER", "containerType": "FOLDER"})
+            folder = self.add_container(folder_id, "folder", path)
+            self.fill_folder(folder, depth - 1, fan_out, views_per_folder)
+
+    def view_rows(self) -> list[dict]:
+        return [{k: v for k, v in view.items() if k != "path_list"} for view in self.views]
+
+    def column_rows(self) -> list[dict]:
+        rows = []
+        for entity in self.entities.values():
+            for i, field in enumerate(entity.get("fields", [])):
+                data_type = "CHARACTER VARYING" if field["type"]["name"] == "VARCHAR" else field["type"]["name"]
+                rows.append({
+                    "TABLE_SCHEMA": ".".join(entity["path"][:-1]), "TABLE_NAME": entity["path"][-1],
+                    "COLUMN_NAME": field["name"], "ORDINAL_POSITION": i + 1, "DATA_TYPE": data_type,
+                    "NUMERIC_PRECISION": None, "NUMERIC_SCALE": None
+                })
+        return rows
+
+    def query(self, sql: str) -> list[dict]:
+        """
+        Answer a system table query. Only ID lists are filtered, path predicates are ignored.
+        """
+        if "sys.views" in sql.lower():
+            rows = self.view_rows()
+        elif "sys.reflections" in sql.lower():
+            rows = self.reflections
+        elif "sys.jobs_recent" in sql.lower():
+            rows = self.jobs_history
+        elif 'information_schema."columns"' in sql.lower():
+            rows = self.column_rows()
+        else:
+            rows = []
+        match = re.search(r"where (view_id|dataset_id) in \((.*)\)", sql, re.IGNORECASE | re.DOTALL)
+        if match:
+            ids = set(re.findall(r"'((?:[^']|'')*)'", match.group(2)))
+            rows = [row for row in rows if row[match.group(1).lower()] in ids]
+        elif "where false" in sql.lower():
+            rows = []
+        return rows
+
+
+class MockDremioServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Dremio REST endpoints used by DremioAPI, with injected latency and per-endpoint request counts
+    """
+    daemon_threads = True
+
+    def __init__(self, catalog: MockDremioCatalog, latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), MockDremioRequestHandler)
+        self.catalog = catalog
+        self.latency = latency
+        self.jobs = {}
+        self.request_counts = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.request_counts = {}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class MockDremioRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are sent separately, which otherwise stalls keep-alive connections on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if urlparse(self.path).path.rstrip("/") != "/api/v3/sql":
+            return self.send_json(404, {"errorMessage": "Not found"})
+        self.server.count("sql")
+        time.sleep(self.server.latency)
+        rows = self.server.catalog.query(body["sql"])
+        with self.server.lock:
+            job_id = f"job-{len(self.server.jobs)}"
+            self.server.jobs[job_id] = rows
+        self.send_json(200, {"id": job_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        time.sleep(self.server.latency)
+        catalog = self.server.catalog
+
+        if path == "/api/v3/catalog":
+            self.server.count("catalog")
+            return self.send_json(200, {"data": catalog.root})
+        match = re.fullmatch(r"/api/v3/catalog/by-path/(.+)", path)
+        if match:
+            self.server.count("catalog")
+            entity = catalog.by_path.get(tuple(unquote(match.group(1)).split("/")))
+            return self.send_json(200, self.strip(entity)) if entity else self.send_json(404, {"errorMessage": "Not found"})
+        match = re.fullmatch(r"/api/v3/catalog/([^/]+)(/graph|/collaboration/tag|/collaboration/wiki)?", path)
+        if match:
+            entity_id, sub_resource = match.groups()
+            entity = catalog.entities.get(unquote(entity_id))
+            if sub_resource == "/graph":
+                self.server.count("graph")
+                if entity is None:
+                    return self.send_json(404, {"errorMessage": "Not found"})
+                return self.send_json(200, {"parents": entity.get("parents", []), "children": []})
+            if sub_resource == "/collaboration/tag":
+                self.server.count("tag")
+                # Every third dataset carries tags, all others return 404 like Dremio does
+                if entity is None or sum(map(ord, entity["id"])) % 3:
+                    return self.send_json(404, {"errorMessage": "Tags not found"})
+                return self.send_json(200, {"tags": ["bench", entity["id"]], "version": "1"})
+            if sub_resource == "/collaboration/wiki":
+                self.server.count("wiki")
+                if entity is None or not entity["id"].endswith("1"):
+                    return self.send_json(404, {"errorMessage": "Wiki not found"})
+                return self.send_json(200, {"text": f"Wiki of {entity['id']}", "version": 1})
+            self.server.count("catalog")
+            if entity is None:
+                return self.send_json(404, {"errorMessage": "Not found"})
+            return self.send_json(200, self.page_children(self.strip(entity), parse_qs(url.query)))
+        match = re.fullmatch(r"/api/v3/job/([^/]+)(/results)?", path)
+        if match:
+            job_id, results = match.groups()
+            rows = self.server.jobs.get(job_id)
+            if rows is None:
+                return self.send_json(404, {"errorMessage": "Job not found"})
+            if not results:
+                self.server.count("job")
+                return self.send_json(200, {"jobState": "COMPLETED", "rowCount": len(rows)})
+            self.server.count("results")
+            query = parse_qs(url.query)
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["100"])[0])
+            if limit > 500:
+                return self.send_json(400, {"errorMessage": "limit must be at most 500"})
+            return self.send_json(200, {"rowCount": len(rows), "rows": rows[offset:offset + limit], "schema": []})
+        self.send_json(404, {"errorMessage": "Not found"})
+
+    @staticmethod
+    def page_children(entity: dict, query: dict) -> dict:
+        """
+        Page the children of a container like Dremio does for maxChildren, the page token is the offset
+        """
+        if "children" not in entity or "maxChildren" not in query:
+            return entity
+        children = entity["children"]
+        offset = int(query.get("pageToken", ["0"])[0])
+        limit = int(query["maxChildren"][0])
+        entity = dict(entity, children=children[offset:offset + limit])
+        if offset + limit < len(children):
+            entity["nextPageToken"] = str(offset + limit)
+        return entity
+
+    @staticmethod
+    def strip(entity: dict) -> dict:
+        return {k: v for k, v in entity.items() if k != "parents"}
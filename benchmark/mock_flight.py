@@ -0,0 +1,46 @@
+import threading
+
+import pyarrow as pa
+from pyarrow import flight
+
+from mock_dremio import MockDremioCatalog
+
+# Rows per record batch, so that results are streamed in several batches like from Dremio
+BATCH_SIZE = 256
+
+
+class MockFlightServer(flight.FlightServerBase):
+    """
+    Local stand-in for the Dremio Arrow Flight endpoint, answering the system table queries of a MockDremioCatalog
+    """
+
+    def __init__(self, catalog: MockDremioCatalog, port=0):
+        super().__init__(f"grpc://127.0.0.1:{port}")
+        self.catalog = catalog
+        self.tables = {}
+        self.request_counts = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"grpc://127.0.0.1:{self.port}"
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def get_flight_info(self, context, descriptor):
+        self.count("flight_info")
+        table = pa.Table.from_pylist(self.catalog.query(descriptor.command.decode("utf-8")))
+        with self.lock:
+            ticket = str(len(self.tables)).encode("utf-8")
+            self.tables[ticket] = table
+        endpoint = flight.FlightEndpoint(ticket, [self.url])
+        return flight.FlightInfo(table.schema, descriptor, [endpoint], table.num_rows, -1)
+
+    def do_get(self, context, ticket):
+        self.count("flight_get")
+        with self.lock:
+            table = self.tables.pop(ticket.ticket)
+        batches = table.to_batches(max_chunksize=BATCH_SIZE)
+        return flight.RecordBatchStream(pa.RecordBatchReader.from_batches(table.schema, batches))
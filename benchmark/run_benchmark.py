@@ -0,0 +1,171 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_dremio import MockDremioCatalog, MockDremioServer
+
+repo_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+logging.basicConfig(stream=sys.stdout,
+                    format="%(levelname)s\t%(asctime)s - %(message)s",
+                    level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def generate_path_str(view_path: list[str]) -> str:
+    return "_".join(view_path).replace(" ", "").lower()
+
+
+def validate_output(catalog: MockDremioCatalog, output_dir: str) -> list[str]:
+    """
+    Compare the generated models against the synthetic catalog
+
+    Returns:
+        A list of error messages, empty if the output is correct
+    """
+    errors = []
+    expected_files = set()
+    for view in catalog.views:
+        path = view["path_list"]
+        model_file = os.path.join(output_dir, "models", *path[:-1], generate_path_str(path) + ".sql")
+        expected_files.add(model_file)
+        if not os.path.exists(model_file):
+            errors.append(f"Missing model {model_file}")
+            continue
+        with open(model_file, "r") as f:
+            model = f.read()
+        if view["sql_definition"] not in model:
+            errors.append(f"SQL definition missing in {model_file}")
+        for parent in catalog.entities[view["view_id"]]["parents"]:
+            if parent["datasetType"] == "VIRTUAL" and f"ref('{generate_path_str(parent['path'])}')" not in model:
+                errors.append(f"Reference to {parent['path']} missing in {model_file}")
+    reflection_files = set(glob.glob(os.path.join(output_dir, "models", "**", "REFL_*.sql"), recursive=True))
+    if len(reflection_files) != len(catalog.reflections):
+        errors.append(f"Expected {len(catalog.reflections)} reflection models, found {len(reflection_files)}")
+    model_files = set(glob.glob(os.path.join(output_dir, "models", "**", "*.sql"), recursive=True))
+    for model_file in sorted(model_files - expected_files - reflection_files):
+        errors.append(f"Unexpected model {model_file}")
+    return errors
+
+
+def run_export(server: MockDremioServer, work_dir: str, exporter_args: list[str], flight_server=None) -> dict:
+    """
+    Run the full dbt_export.py pipeline as a subprocess against the mock server and measure it
+    """
+    # The exporter writes its catalog artifacts next to the script, so it is run from a copy
+    for filename in glob.glob(os.path.join(repo_path, "*.py")):
+        shutil.copy(filename, work_dir)
+    filter_json = os.path.join(work_dir, "export_filter.json")
+    with open(filter_json, "w") as f:
+        json.dump({"source_selector": [["bench_lake"]], "space_selector": []}, f)
+
+    command = [sys.executable, os.path.join(work_dir, "dbt_export.py"),
+               "--export-filter-json", filter_json,
+               "--dremio-endpoint", server.url,
+               "--dremio-pat", "benchmark",
+               "--output-dir", work_dir] + exporter_args
+    if flight_server:
+        command += ["--flight-endpoint", flight_server.url]
+    server.reset_counts()
+    with open(os.path.join(work_dir, "export.log"), "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=work_dir)
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    request_counts = dict(server.request_counts)
+    if flight_server:
+        request_counts.update(flight_server.request_counts)
+
+    return {
+        "exit_code": process.returncode,
+        "wall_time_s": round(wall_time, 3),
+        "requests": sum(request_counts.values()),
+        "requests_by_endpoint": dict(sorted(request_counts.items())),
+        "peak_rss_mb": round(rusage.ru_maxrss / 1024, 1)
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for metric in ["wall_time_s", "requests", "peak_rss_mb"]:
+        if baseline.get(metric) and results[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{metric} regressed from {baseline[metric]} to {results[metric]}")
+    return regressions
+
+
+def parse_cli_args():
+    parser = argparse.ArgumentParser(description='Benchmark dbt_export.py against a local mock Dremio REST server')
+    parser.add_argument('--spaces', type=int, default=2, help='Number of spaces (default: 2)')
+    parser.add_argument('--depth', type=int, default=3, help='Folder depth below each space (default: 3)')
+    parser.add_argument('--fan-out', type=int, default=3, help='Sub-folders per folder (default: 3)')
+    parser.add_argument('--views-per-folder', type=int, default=5, help='Views per folder (default: 5)')
+    parser.add_argument('--tables', type=int, default=20, help='Number of PDSs in the source (default: 20)')
+    parser.add_argument('--reflections', type=int, default=10, help='Number of reflections (default: 10)')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Injected latency per request (default: 5)')
+    parser.add_argument('--exporter-args', type=str, default='',
+                        help='Additional arguments for dbt_export.py, e.g. "--max-workers 8"')
+    parser.add_argument('--flight', action='store_true',
+                        help='Serve the system table queries from a local Arrow Flight stand-in (requires pyarrow)')
+    parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', type=str, help='Results JSON of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression against the baseline (default: 0.2)')
+    parser.add_argument('--keep-output', action='store_true', help='Keep the working directory of the export')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    args = parse_cli_args()
+    catalog = MockDremioCatalog(args.spaces, args.depth, args.fan_out, args.views_per_folder, args.tables, args.reflections)
+    logger.info(f"Generated mock catalog with {len(catalog.entities)} entities and {len(catalog.views)} views")
+    server = MockDremioServer(catalog, latency=args.latency_ms / 1000).start()
+    flight_server = None
+    if args.flight:
+        from mock_flight import MockFlightServer
+        flight_server = MockFlightServer(catalog)
+
+    work_dir = tempfile.mkdtemp(prefix="dremio_dbt_benchmark_")
+    try:
+        results = run_export(server, work_dir, shlex.split(args.exporter_args), flight_server)
+        errors = validate_output(catalog, work_dir) if results["exit_code"] == 0 else ["Export failed, see export.log"]
+    finally:
+        server.shutdown()
+        if flight_server:
+            flight_server.shutdown()
+        if args.keep_output:
+            logger.info(f"Export output kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir)
+
+    results = {
+        "catalog": {"entities": len(catalog.entities), "views": len(catalog.views), "latency_ms": args.latency_ms},
+        "exporter_args": args.exporter_args,
+        "flight": args.flight,
+        **results,
+        "correct": len(errors) == 0,
+        "errors": errors[:20]
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    exit_code = 0 if results["correct"] else 1
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for r in regressions:
+            logger.error(r)
+        if regressions:
+            exit_code = 1
+    sys.exit(exit_code)
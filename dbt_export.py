@@ -3,8 +3,21 @@ import logging
 import json
 import dremio_api
 import dremio_collect_catalog
+import dremio_collect_columns
+import dremio_change_feed
+import dremio_collect_lineage
+import dremio_sql_lineage
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from dbt_model_writer import ModelWriter
+from dremio_catalog_store import CatalogStore, NdjsonCatalogReader, NdjsonCatalogWriter, catalog_entity_from_lookup_entry
+from dremio_flight import DremioFlightClient
+from dremio_profile import RunProfile
+from dremio_selector import CatalogSelector
 import os
+import signal
 import sys
+import threading
 import urllib3
 urllib3.disable_warnings()
 
@@ -24,41 +37,134 @@ def generate_path_str(view_path: list[str]) -> str:
     return s
 
 
-def write_catalog_entries_to_file(api: dremio_api.DremioAPI, space_selector=set(), source_selector=set()) -> list[dict]:
+def write_catalog_entries_to_file(api: dremio_api.DremioAPI, selector: CatalogSelector, max_workers=1, snapshot=None, dataset_ids=None, resume=False, view_rows=None, artifacts_dir=dir_path) -> CatalogStore:
+    """
+    Args:
+        view_rows: Optional sys.views rows, the lineage of these views is derived from their SQL after the traversal
+            instead of requesting /graph per view
+    """
+    checkpoint = dremio_collect_catalog.TraversalCheckpoint(os.path.join(artifacts_dir, 'dremio_catalog_checkpoint.ndjson'))
+    deferred_lineage_ids = {row['view_id'] for row in view_rows} if view_rows is not None else None
+    with NdjsonCatalogWriter(os.path.join(artifacts_dir, 'dremio_catalog.ndjson')) as catalog_writer:
+        catalog_store = dremio_collect_catalog.get_catalog_entries(api, selector, max_workers, snapshot, dataset_ids,
+                                                                   catalog_writer, checkpoint, resume,
+                                                                   deferred_lineage_ids=deferred_lineage_ids)
+    refreshed = dremio_collect_catalog.refresh_reused_lineage(api, catalog_store, snapshot, selector, max_workers)
+    if view_rows is not None:
+        dremio_sql_lineage.resolve_view_lineage(api, catalog_store, view_rows, max_workers)
+    if refreshed or view_rows is not None:
+        # Rewrite the catalog streamed during the traversal with the updated parents
+        write_catalog_ndjson(catalog_store, artifacts_dir)
+    write_catalog_entries_json(catalog_store, artifacts_dir)
+    return catalog_store
 
-    catalog_entries = dremio_collect_catalog.get_catalog_entries(api, space_selector, source_selector)
-    json_filename = 'dremio_catalog_entries.json'
-    with open(os.path.join(dir_path, json_filename), 'w') as f:
-        json.dump(catalog_entries, f)
-        logger.info(f"Created {json_filename} with {len(catalog_entries)} entries")
 
-    return catalog_entries
+def write_lineage_catalog_to_file(api: dremio_api.DremioAPI, lineage_selector: list, max_workers=1, snapshot=None, full_metadata=False, artifacts_dir=dir_path) -> CatalogStore:
+
+    catalog_store = dremio_collect_lineage.collect_lineage_closure(api, lineage_selector, max_workers, snapshot, full_metadata)
+    write_catalog_ndjson(catalog_store, artifacts_dir)
+    write_catalog_entries_json(catalog_store, artifacts_dir)
+    return catalog_store
+
+
+def write_catalog_ndjson(catalog_store: CatalogStore, artifacts_dir=dir_path):
+
+    with NdjsonCatalogWriter(os.path.join(artifacts_dir, 'dremio_catalog.ndjson')) as catalog_writer:
+        for entity, parents in catalog_store.iter_items():
+            catalog_writer.write(entity, parents)
+
 
+def write_catalog_entries_json(catalog_store: CatalogStore, artifacts_dir=dir_path):
 
-def write_catalog_lookup_to_file(catalog_entries) -> dict[dict]:
+    json_filename = 'dremio_catalog_entries.json'
+    with open(os.path.join(artifacts_dir, json_filename), 'w') as f:
+        # Entries are serialized one at a time, so the per-parent rows are never materialized in memory
+        f.write('[')
+        entry_count = 0
+        for entry in catalog_store.iter_entries():
+            if entry_count > 0:
+                f.write(', ')
+            json.dump(entry, f)
+            entry_count += 1
+        f.write(']')
+        logger.info(f"Created {json_filename} with {entry_count} entries")
+
+
+def write_catalog_lookup_to_file(catalog_store: CatalogStore, artifacts_dir=dir_path):
 
-    catalog_lookup = dremio_collect_catalog.generate_catalog_lookup(catalog_entries)
     json_filename = 'dremio_catalog_lookup.json'
-    with open(os.path.join(dir_path, json_filename), 'w') as f:
-        json.dump(catalog_lookup, f)
-        logger.info(f"Created {json_filename} with {len(catalog_lookup)} entries")
+    with open(os.path.join(artifacts_dir, json_filename), 'w') as f:
+        f.write('{')
+        for i, (catalog_id, lookup_entry) in enumerate(catalog_store.iter_lookup()):
+            if i > 0:
+                f.write(', ')
+            f.write(json.dumps(catalog_id) + ': ')
+            json.dump(lookup_entry, f)
+        f.write('}')
+        logger.info(f"Created {json_filename} with {len(catalog_store)} entries")
+
+
+def read_catalog_snapshot_from_file(artifacts_dir=dir_path) -> dict[dict]:
+
+    json_filename = 'dremio_catalog_snapshot.json'
+    try:
+        with open(os.path.join(artifacts_dir, json_filename), 'r') as f:
+            snapshot = json.load(f)
+            logger.info(f"Loaded {json_filename} with {len(snapshot)} entries")
+    except FileNotFoundError:
+        logger.warning(f"No {json_filename} found, running a full export")
+        snapshot = {}
 
-    return catalog_lookup
+    return snapshot
 
 
-def generate_parent_refs(view_path, parents: list[dict], catalog_lookup: dict[dict]) -> list[str]:
+def write_catalog_snapshot_to_file(catalog_store: CatalogStore, artifacts_dir=dir_path) -> dict[dict]:
+
+    snapshot = catalog_store.generate_snapshot()
+    json_filename = 'dremio_catalog_snapshot.json'
+    with open(os.path.join(artifacts_dir, json_filename), 'w') as f:
+        json.dump(snapshot, f)
+        logger.info(f"Created {json_filename} with {len(snapshot)} entries")
+
+    return snapshot
+
+
+def plan_export_dataset_ids(view_rows, reflections: dict) -> set[str]:
+    # Only views and reflection targets end up in models/, all other datasets are referenced by path and type only
+    dataset_ids = {row['view_id'] for row in view_rows}
+    dataset_ids.update(r['dataset_id'] for r in reflections['rows'])
+    logger.info(f"Planned metadata retrieval for {len(dataset_ids)} exported datasets")
+    return dataset_ids
+
+
+def spool_view_rows(view_rows, filename: str):
+    """
+    Yield the sys.views rows while appending them to an NDJSON file, from which read_spooled_view_rows reads them again
+    """
+    with open(filename, 'w') as f:
+        for row in view_rows:
+            # Timestamps of Arrow Flight results are not JSON types, they are not needed for the models
+            f.write(json.dumps(row, default=str) + '\n')
+            yield row
+
+
+def read_spooled_view_rows(filename: str):
+    with open(filename, 'r') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def generate_parent_refs(view_path, parents: tuple[str], catalog_store: CatalogStore, pds_paths: list) -> list[str]:
     logger.debug(f"Adding parent references for {view_path}")
     parent_ids = set()
     parent_paths = []
-    for p in parents:
-        parent_id = p['id']
-        try:
-            parent = catalog_lookup[parent_id]
-        except KeyError as e:
-            logger.warning(f"Parent ID {parent_id} for view {view_path} not found in catalog lookup - {e}")
+    for parent_id in parents:
+        parent = catalog_store.get(parent_id)
+        if parent is None:
+            logger.warning(f"Parent ID {parent_id} for view {view_path} not found in catalog lookup")
             continue
-        p_object_type = parent['object_type']
-        parent_path = parent['object_path']
+        p_object_type = parent.object_type
+        parent_path = parent.object_path
         if parent_id in parent_ids:
             logger.debug(f"Skipping duplicate parent {parent_path}")
             continue
@@ -66,8 +172,7 @@ def generate_parent_refs(view_path, parents: list[dict], catalog_lookup: dict[di
             parent_ids.add(parent_id)
 
         if p_object_type == "PDS":
-            pdss.append(parent_path)
-            dbt_config['pre_hook'].append(parent_path)
+            pds_paths.append(parent_path)
         elif p_object_type == "VDS":
             parent_path_str = generate_path_str(parent_path)
             parent_paths.append(parent_path_str)
@@ -89,13 +194,6 @@ def generate_config(dbt_config: dict[str], parent_paths: list[str]) -> str:
         c += ",\ntags=" + str(dbt_config['tags'])
     if dbt_config.get('description'):
         c += ",\ndescription='" + dbt_config['description'].replace("'", "\\'") + "'"
-    if dbt_config.get('pre_hook'):
-        pre_hooks_str = ',\npre_hook=[\n'
-        for h in dbt_config['pre_hook']:
-            pds_path = '"' + '"."'.join(h) + '"'
-            pre_hooks_str += f"    'ALTER PDS {pds_path} REFRESH METADATA AUTO PROMOTION',\n"
-        pre_hooks_str = pre_hooks_str[:-2] + '\n]\n'
-        c += pre_hooks_str
 
     # For reflections
     if dbt_config.get('reflection_type'):
@@ -132,158 +230,563 @@ def generate_config(dbt_config: dict[str], parent_paths: list[str]) -> str:
     return config
 
 
-def build_sys_views_filter(space_selector: set) -> str:
-    s = ""
-    if len(space_selector) > 0:
-        s += "WHERE FALSE"
-        for space in space_selector:
-            s += f"\n   OR path LIKE '[{space}%' "
-    return s
-
-
-def build_sys_reflections_filter(space_selector: set) -> str:
-    s = ""
-    if len(space_selector) > 0:
-        s += "WHERE FALSE"
-        for space in space_selector:
-            s += f"\n   OR dataset_name LIKE '{space}%' OR dataset_name LIKE '\"{space}%' "
-    return s
-
-def parse_cli_args():
-    parser = argparse.ArgumentParser(description='Dremio dbt exporter')
-    parser.add_argument('--export-filter-json', type=str,
-                        help='Absolute path to export_filter.json file.',
-                        required=True)
-    parser.add_argument('--dremio-endpoint', type=str, help='Dremio URL incl. https:// prefix', required=True)
-    parser.add_argument('--dremio-pat', type=str, help='Dremio PAT', required=True)
-    parser.add_argument('--output-dir', type=str, help='Output directory of dbt models', required=False)
-    cli_args = parser.parse_args()
-    return cli_args
-
-if __name__ == '__main__':
-
-    args = parse_cli_args()
-    if args.output_dir:
-        output_dir = args.output_dir
+def write_view_model(row: dict, catalog_store: CatalogStore, output_dir, model_writer: ModelWriter) -> list:
+    """
+    Render the dbt model of a sys.views row
+
+    Returns:
+        The paths of the PDSs the view depends on
+    """
+    view_id = row['view_id']
+    view_name = row['view_name']
+    sql_definition = row['sql_definition']
+    sql_context: str = row['sql_context']
+    view = catalog_store.get(view_id)
+    if view is None:
+        logger.error(f"Lookup entry not found for {view_name} {row['path']} - {view_id}")
+        return []
+    parents = view.parent_ids
+    view_path = view.object_path
+    tags = view.tags
+    wiki = view.wiki
+
+    dbt_config = {
+        'database': view_path[0],
+        'schema': view_path[1:-1],
+        'alias': view_path[-1],
+        'tags': tags,
+        'description': wiki,
+        'post_hook': []
+    }
+
+    model_path = str(output_dir) + "/models/" + "/".join(view_path[:-1])
+    model_name = model_path + "/" + generate_path_str(view_path) + ".sql"
+
+    pds_paths = []
+    parent_paths = generate_parent_refs(view_path, parents, catalog_store, pds_paths)
+
+    config = generate_config(dbt_config, parent_paths)
+    sql_definition = config + sql_definition
+    if sql_context:
+        logger.warn(f"Found SQL context {sql_context} in view {view_path}")
+        context = str(sql_context.split('.')) # Note that this logic does not handle special cases like "Samples"."samples.dremio.com"
+        sql_definition += "\n--SQL_CONTEXT=" + sql_context
+
+    # write the new model file, creating directories as needed
+    model_writer.write(model_name, sql_definition)
+    return pds_paths
+
+
+def write_pds_promote(pdss, output_dir, artifacts_dir=dir_path):
+
+    with open(os.path.join(artifacts_dir, "pds_promote.sql"), 'w') as f:
+        sql_txt = ""
+        for pds in pdss:
+            pds_path = '"' + '"."'.join(pds) + '"'
+            sql_txt += f'ALTER PDS {pds_path} REFRESH METADATA AUTO PROMOTION;\n'
+        f.write(sql_txt)
+        logger.info(f"Created pds_promote.sql with {len(pdss)} entries")
+    write_pds_refresh_macro(pdss, output_dir)
+
+
+def write_pds_refresh_macro(pds_paths, output_dir):
+    """
+    Write the refresh_pds_metadata macro, which the on-run-start hook of dbt_project.yml calls to refresh the metadata
+    of every PDS referenced by the exported views once per dbt run
+    """
+    macro = "{% macro refresh_pds_metadata() %}\n{% if execute %}\n"
+    for pds in pds_paths:
+        statement = 'ALTER PDS "' + '"."'.join(pds) + '" REFRESH METADATA AUTO PROMOTION'
+        macro += "{% do run_query(" + repr(statement) + ") %}\n"
+    macro += "{% endif %}\n{% endmacro %}\n"
+    macro_filename = os.path.join(str(output_dir), "macros", "refresh_pds_metadata.sql")
+    os.makedirs(os.path.dirname(macro_filename), exist_ok=True)
+    if os.path.exists(macro_filename):
+        with open(macro_filename, 'r') as f:
+            if f.read() == macro:
+                return
+    with open(macro_filename, 'w') as f:
+        f.write(macro)
+    logger.info(f"Created {macro_filename} with {len(pds_paths)} PDS refreshes")
+
+
+def write_column_properties(catalog_store: CatalogStore, pdss, columns_job, output_dir, model_files: set, max_workers=1) -> int:
+    """
+    Write the columns of the exported views and their PDS parents to models/dremio_columns.yml, as dbt model and
+    source properties. The file is only rewritten if its content changed.
+
+    Args:
+        model_files: The model files written in this run, see ModelWriter, so model files left over from previous
+            runs are not exported. None keeps the existing model files, as a change feed export patches the models
+            of the previous export.
+
+    Returns:
+        The number of datasets with columns
+    """
+    view_paths = []
+    for catalog_id in catalog_store:
+        view = catalog_store.get(catalog_id)
+        if view.object_type != 'VDS':
+            continue
+        model_name = os.path.abspath(str(output_dir) + "/models/" + "/".join(view.object_path[:-1]) + "/" + generate_path_str(view.object_path) + ".sql")
+        exported = model_name in model_files if model_files is not None else os.path.exists(model_name)
+        if exported:
+            view_paths.append(tuple(view.object_path))
+    pds_paths = [tuple(pds) for pds in pdss]
+    columns = dremio_collect_columns.collect_dataset_columns(columns_job, view_paths + pds_paths, max_workers)
+
+    properties = "version: 2\n"
+    models = sorted((generate_path_str(path), columns[path]) for path in view_paths if path in columns)
+    if models:
+        properties += "\nmodels:\n"
+        for model_name, model_columns in models:
+            properties += f"  - name: {json.dumps(model_name)}\n" + generate_column_entries(model_columns, "    ")
+    sources = {}
+    for path in sorted(p for p in pds_paths if p in columns):
+        sources.setdefault(path[:-1], []).append(path)
+    if sources:
+        properties += "\nsources:\n"
+        for container, paths in sources.items():
+            properties += f"  - name: {json.dumps(generate_path_str(container))}\n"
+            properties += f"    database: {json.dumps(container[0])}\n"
+            # dbt-dremio addresses the root of a source as no_schema
+            properties += f"    schema: {json.dumps('.'.join(container[1:]) or 'no_schema')}\n"
+            properties += "    tables:\n"
+            for path in paths:
+                properties += f"      - name: {json.dumps(path[-1])}\n" + generate_column_entries(columns[path], "        ")
+
+    properties_filename = os.path.join(str(output_dir), "models", "dremio_columns.yml")
+    os.makedirs(os.path.dirname(properties_filename), exist_ok=True)
+    if os.path.exists(properties_filename):
+        with open(properties_filename, 'r') as f:
+            if f.read() == properties:
+                return len(columns)
+    with open(properties_filename, 'w') as f:
+        f.write(properties)
+    logger.info(f"Created {properties_filename} with the columns of {len(models)} views and {len(columns) - len(models)} PDSs")
+    return len(columns)
+
+
+def generate_column_entries(columns: list[tuple], indent: str) -> str:
+    entries = indent + "columns:\n"
+    for name, data_type in columns:
+        entries += f"{indent}  - name: {json.dumps(name)}\n{indent}    data_type: {json.dumps(data_type)}\n"
+    return entries
+
+
+def write_reflection_model(r: dict, catalog_store: CatalogStore, output_dir, model_writer: ModelWriter):
+    """
+    Render the dbt model of a sys.reflections row
+    """
+    reflection_name = r['reflection_name']
+    reflection_id = r['reflection_id']
+    reflection_type = r['type']
+    dataset_id = r['dataset_id']
+    dataset_name = r['dataset_name']
+    dataset_type = r['dataset_type']
+    display_columns = r['display_columns']
+    sort_columns = r['sort_columns']
+    partition_columns = r['partition_columns']
+    dimensions = r['dimensions']
+    measures = r['measures']
+    dataset = catalog_store.get(dataset_id)
+    if dataset is None:
+        #logger.error(f"Lookup entry not found for {dataset_name} - {dataset_id}")
+        return
+    dataset_path = dataset.object_path
+    ref = generate_path_str(dataset_path)
+
+    if reflection_type == 'RAW':
+        refl_type = 'raw'
+    elif reflection_type == 'AGGREGATION':
+        refl_type = 'aggregate'
     else:
-        output_dir = dir_path
-
-    with open(args.export_filter_json, 'r') as f:
-        d = json.load(f)
-        source_selector = d["source_selector"]
-        space_selector = d["space_selector"]
-
-    api = dremio_api.DremioAPI(args.dremio_pat, args.dremio_endpoint, timeout=60)
-
-    if True:
-        catalog_entries = write_catalog_entries_to_file(api, space_selector, source_selector)
-        catalog_lookup = write_catalog_lookup_to_file(catalog_entries)
-    else: # for local debugging
-        # with open("dremio_catalog_entries.json", 'r') as f:
-        #     catalog_entries = json.load(f)
-        with open("dremio_catalog_lookup.json", 'r') as f:
-            catalog_lookup = json.load(f)
-
-    # Retrieve full list of views and SQL definitions from system table
-    where_clause = build_sys_views_filter(space_selector)
-    job_id = api.post_sql_query('SELECT * FROM sys.views ' + where_clause)
-    views = api.get_query_data(job_id)
-
-    pdss = []
-
-    for row in views['rows']:
-        view_id = row['view_id']
-        view_name = row['view_name']
-        sql_definition = row['sql_definition']
-        sql_context: str = row['sql_context']
-        try:
-            parents = catalog_lookup[view_id]['parents']
-            view_path = catalog_lookup[view_id]['object_path']
-            tags = catalog_lookup[view_id]['tags']
-            wiki = catalog_lookup[view_id]['wiki']
-        except Exception as e:
-            logger.error(f"Lookup entry not found for {view_name} {row['path']} - {view_id}")
+        logger.error(f"Unsupported reflection type {reflection_type} for dataset {dataset_name}")
+        return
+
+    dbt_config = {
+        'reflection_name': reflection_name,
+        'reflection_type': refl_type,
+        'display': display_columns,
+        'dimensions': dimensions,
+        'measures': measures,
+        'computations': None, # TODO
+        'localsort_by': sort_columns,
+        'partition_by': partition_columns,
+    }
+    config = generate_config(dbt_config, [ref])
+
+    refl_path = str(output_dir) + "/models/" + "/".join(dataset_path[:-1])
+    refl_name = refl_path + "/REFL_" + reflection_name.replace(" ", "").lower() + "_" + reflection_id[:8] + ".sql"
+
+    model_writer.write(refl_name, config)
+
+
+def partition_catalog_roots(catalog_root, selector: CatalogSelector, shards: int) -> list[list[dict]]:
+    """
+    Split the selected spaces and sources into contiguous blocks, so the merged shards keep the traversal order
+    """
+    roots = dremio_collect_catalog.select_catalog_roots(catalog_root, selector)
+    size = -(-len(roots) // shards)
+    return [roots[i:i + size] for i in range(0, len(roots), size)] if roots else []
+
+
+def export_catalog_shard(shard: int, roots: list[dict], api_args: dict, selector: CatalogSelector, max_workers=1, snapshot=None, dataset_ids=None, resume=False, deferred_lineage_ids=None, artifacts_dir=dir_path) -> tuple:
+    """
+    Traverse the spaces and sources of one shard in a worker process
+
+    Returns:
+        A tuple of the shard's NDJSON catalog file in traversal order and the request statistics and counters of
+        the shard's API client
+    """
+    api = dremio_api.DremioAPI(**api_args)
+    checkpoint = dremio_collect_catalog.TraversalCheckpoint(
+        os.path.join(artifacts_dir, f'dremio_catalog_checkpoint.shard-{shard}.ndjson'))
+    catalog_store = dremio_collect_catalog.get_catalog_entries(api, selector, max_workers, snapshot, dataset_ids,
+                                                               None, checkpoint, resume, {'data': roots},
+                                                               deferred_lineage_ids)
+    filename = os.path.join(artifacts_dir, f'dremio_catalog.shard-{shard}.ndjson')
+    with NdjsonCatalogWriter(filename) as catalog_writer:
+        for entity, parents in catalog_store.iter_items():
+            catalog_writer.write(entity, parents)
+    return filename, api.profile.endpoints, api.profile.counters
+
+
+def merge_catalog_shards(shard_filenames: list[str]) -> CatalogStore:
+    """
+    Merge the shard catalogs in shard order into one store. Parent references across shards resolve against the
+    merged store.
+    """
+    catalog_store = CatalogStore()
+    for filename in shard_filenames:
+        with open(filename, 'rb') as f:
+            for line in f:
+                catalog_store.add(*catalog_entity_from_lookup_entry(json.loads(line)))
+        os.remove(filename)
+        os.remove(filename + '.idx')
+    return catalog_store
+
+
+def write_catalog_shards(api: dremio_api.DremioAPI, api_args: dict, shard_pool: ProcessPoolExecutor, shard_roots: list, selector: CatalogSelector, max_workers=1, snapshot=None, dataset_ids=None, resume=False, view_rows=None, artifacts_dir=dir_path) -> CatalogStore:
+    deferred_lineage_ids = {row['view_id'] for row in view_rows} if view_rows is not None else None
+    if isinstance(dataset_ids, Future):
+        # The shard processes need the complete export plan before they start
+        dataset_ids = dataset_ids.result()
+    futures = [shard_pool.submit(export_catalog_shard, shard, roots, api_args, selector, max_workers, snapshot,
+                                 dataset_ids, resume, deferred_lineage_ids, artifacts_dir)
+               for shard, roots in enumerate(shard_roots)]
+    shard_filenames = []
+    for future in futures:
+        filename, endpoints, counters = future.result()
+        api.profile.merge(endpoints, counters)
+        shard_filenames.append(filename)
+    catalog_store = merge_catalog_shards(shard_filenames)
+    logger.info(f"Merged {len(shard_filenames)} catalog shards with {len(catalog_store)} entries")
+    # Parents recreated in another shard are only found in the merged catalog
+    dremio_collect_catalog.refresh_reused_lineage(api, catalog_store, snapshot, selector, max_workers)
+    if view_rows is not None:
+        # Views may read from datasets of other shards, so their SQL is resolved against the merged catalog
+        dremio_sql_lineage.resolve_view_lineage(api, catalog_store, view_rows, max_workers)
+    write_catalog_ndjson(catalog_store, artifacts_dir)
+    write_catalog_entries_json(catalog_store, artifacts_dir)
+    return catalog_store
+
+
+def write_view_models_shard(indexed_rows: list[tuple], catalog_filename: str, output_dir) -> tuple:
+    """
+    Render the views of one shard in a worker process, looking up entities in the merged NDJSON catalog
+
+    Returns:
+        A tuple of the (row index, PDS paths) pairs, the ModelWriter summary and the written model files
+    """
+    catalog_store = NdjsonCatalogReader(catalog_filename)
+    model_writer = ModelWriter(os.path.join(str(output_dir), "models"))
+    pds_paths = [(i, write_view_model(row, catalog_store, output_dir, model_writer)) for i, row in indexed_rows]
+    summary = model_writer.close()
+    catalog_store.close()
+    return pds_paths, summary, model_writer.model_files
+
+
+def write_view_models_sharded(view_rows, catalog_store: CatalogStore, shard_pool: ProcessPoolExecutor, shard_roots: list, output_dir, model_writer: ModelWriter, pdss: dict, artifacts_dir=dir_path):
+    root_shards = {root['path'][0]: shard for shard, roots in enumerate(shard_roots) for root in roots}
+    shard_rows = [[] for _ in shard_roots]
+    for i, row in enumerate(view_rows):
+        view = catalog_store.get(row['view_id'])
+        if view is None:
+            logger.error(f"Lookup entry not found for {row['view_name']} {row['path']} - {row['view_id']}")
             continue
-
-        dbt_config = {
-            'database': view_path[0],
-            'schema': view_path[1:-1],
-            'alias': view_path[-1],
-            'tags': tags,
-            'description': wiki,
-            'pre_hook': [],
-            'post_hook': []
-        }
-
-        model_path = str(output_dir) + "/models/" + "/".join(view_path[:-1])
-        model_name = model_path + "/" + generate_path_str(view_path) + ".sql"
-
-        parent_paths = generate_parent_refs(view_path, parents, catalog_lookup)
-
-        config = generate_config(dbt_config, parent_paths)
-        sql_definition = config + sql_definition
-        if sql_context:
-            logger.warn(f"Found SQL context {sql_context} in view {view_path}")
-            context = str(sql_context.split('.')) # Note that this logic does not handle special cases like "Samples"."samples.dremio.com"
-            sql_definition += "\n--SQL_CONTEXT=" + sql_context
-
-        # create the new directories as needed
-        if not os.path.exists(model_path):
-            os.makedirs(model_path)
-
-        # write the new model file
-        with open(model_name, "w") as file:
-            file.write(sql_definition)
+        shard_rows[root_shards.get(view.object_path[0], 0)].append((i, row))
+    catalog_filename = os.path.join(artifacts_dir, 'dremio_catalog.ndjson')
+    futures = [shard_pool.submit(write_view_models_shard, rows, catalog_filename, output_dir)
+               for rows in shard_rows if rows]
+    view_pds_paths = []
+    for future in futures:
+        pds_paths, summary, model_files = future.result()
+        view_pds_paths.extend(pds_paths)
+        model_writer.merge(summary, model_files)
+    # Keep the order of the views, so pds_promote.sql does not depend on the sharding
+    for _, pds_paths in sorted(view_pds_paths, key=lambda p: p[0]):
+        pdss.update(dict.fromkeys(tuple(pds) for pds in pds_paths))
+
+
+def read_export_state_from_file(artifacts_dir=dir_path) -> dict:
+
+    json_filename = 'dremio_export_state.json'
+    try:
+        with open(os.path.join(artifacts_dir, json_filename), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_export_state_to_file(state: dict, artifacts_dir=dir_path):
+
+    json_filename = 'dremio_export_state.json'
+    with open(os.path.join(artifacts_dir, json_filename), 'w') as f:
+        json.dump(state, f, indent=2)
+        logger.info(f"Created {json_filename}")
+
+
+def plan_change_feed(state: dict, dremio_url: str, export_filter: dict, full_crawl_interval: float, now: datetime, artifacts_dir=dir_path) -> datetime:
+    """
+    Returns:
+        The time from which the jobs history is read, or None if a full crawl is needed
+    """
+    if not state or not os.path.exists(os.path.join(artifacts_dir, 'dremio_catalog.ndjson')):
+        logger.info("No previous export found, running a full crawl")
+        return None
+    if state['dremio_url'] != dremio_url or state['export_filter'] != export_filter:
+        logger.info("The previous export used a different endpoint or export filter, running a full crawl")
+        return None
+    last_full_export = datetime.fromisoformat(state['last_full_export'])
+    if now - last_full_export > timedelta(hours=full_crawl_interval):
+        logger.info(f"The last full crawl ran at {last_full_export.isoformat()}, running a full crawl")
+        return None
+    return datetime.fromisoformat(state['last_export']) - dremio_change_feed.CHANGE_FEED_OVERLAP
+
+
+def iter_dataset_model_files(dataset_path, output_dir):
+    """
+    Yield the model file of a view and the reflection models that reference the dataset, as far as they exist
+    """
+    ref = generate_path_str(dataset_path)
+    model_path = str(output_dir) + "/models/" + "/".join(dataset_path[:-1])
+    if os.path.exists(model_path + "/" + ref + ".sql"):
+        yield os.path.abspath(model_path + "/" + ref + ".sql")
+    if not os.path.isdir(model_path):
+        return
+    for name in os.listdir(model_path):
+        if name.startswith("REFL_"):
+            with open(os.path.join(model_path, name), 'r') as f:
+                if f"ref('{ref}')" in f.read():
+                    yield os.path.abspath(os.path.join(model_path, name))
+
+
+def export_catalog_changes(api: dremio_api.DremioAPI, sql_client, selector: CatalogSelector, since: datetime, output_dir, max_workers=1, jobs_table='sys.jobs_recent', artifacts_dir=dir_path) -> tuple[CatalogStore, dict]:
+    """
+    Patch the catalog and the models of the previous export with the changes recorded in the jobs history
+
+    Returns:
+        A tuple of the patched catalog and the paths of the PDSs referenced by its views
+    """
+    # The NDJSON catalog keeps the version tags, so the rewritten snapshot still covers the unchanged datasets
+    catalog_store = CatalogStore.from_ndjson(os.path.join(artifacts_dir, 'dremio_catalog.ndjson'))
+    changes = dremio_change_feed.query_catalog_changes(sql_client, since, jobs_table)
+    result = dremio_change_feed.apply_catalog_changes(api, catalog_store, changes, selector, max_workers)
+    api.profile.set('catalog_changes', len(changes))
+
+    # Models of updated datasets are rewritten, reflection models that are not rewritten belong to dropped reflections
+    stale_files = set()
+    for catalog_id in result.updated_ids:
+        stale_files.update(iter_dataset_model_files(catalog_store.get(catalog_id).object_path, output_dir))
+    for entity in result.removed:
+        stale_files.update(iter_dataset_model_files(entity.object_path, output_dir))
+
+    view_ids = [c for c in result.updated_ids + result.dependent_ids if catalog_store.get(c).object_type == 'VDS']
+    views_job = sql_client.submit_sql_query('SELECT * FROM sys.views '
+                                            + dremio_collect_lineage.build_sys_id_filter('view_id', view_ids))
+    reflections_job = sql_client.submit_sql_query('SELECT * FROM sys.reflections '
+                                                  + dremio_collect_lineage.build_sys_id_filter('dataset_id', result.updated_ids))
+    model_writer = ModelWriter(os.path.join(str(output_dir), "models"))
+    for row in views_job.iter_rows(max_workers):
+        write_view_model(row, catalog_store, output_dir, model_writer)
+    for r in reflections_job.get_data()['rows']:
+        write_reflection_model(r, catalog_store, output_dir, model_writer)
+    for counter, value in model_writer.close().items():
+        api.profile.set(f'model_files_{counter}', value)
+    for filename in stale_files - model_writer.model_files:
+        logger.info(f"Deleting model {filename} of a removed view or reflection")
+        os.remove(filename)
+
+    write_catalog_ndjson(catalog_store, artifacts_dir)
+    write_catalog_entries_json(catalog_store, artifacts_dir)
+    write_catalog_lookup_to_file(catalog_store, artifacts_dir)
+    write_catalog_snapshot_to_file(catalog_store, artifacts_dir)
+
+    pdss = {}
+    for catalog_id in catalog_store:
+        for parent_id in catalog_store.get(catalog_id).parent_ids:
+            parent = catalog_store.get(parent_id)
+            if parent is not None and parent.object_type == 'PDS':
+                pdss[parent.object_path] = None
+    return catalog_store, pdss
+
+
+def export_target(args, export_filter: dict, dremio_url: str, dremio_pat: str, output_dir, artifacts_dir=dir_path, flight_endpoint=None) -> RunProfile:
+    """
+    Export the models of one Dremio environment
+
+    Args:
+        args: Parsed command line arguments with the export settings shared by all targets
+        artifacts_dir: Directory of the catalog lookup, snapshot, checkpoint and the other export artifacts
+
+    Returns:
+        The run profile of the export
+    """
+    selector = CatalogSelector(export_filter["space_selector"], export_filter["source_selector"],
+                               export_filter.get("exclude_selector", []))
+    lineage_selector = export_filter.get("lineage_selector", [])
+
+    api_args = dremio_api.build_api_args(args, dremio_url, dremio_pat)
+    if args.rate_limit:
+        # Shards share the request budget
+        api_args['rate_limit'] = args.rate_limit / args.shards
+    api = dremio_api.DremioAPI(**api_args)
+    # System table queries go through Arrow Flight if configured, the catalog is always read through REST
+    if flight_endpoint:
+        sql_client = DremioFlightClient(flight_endpoint, dremio_pat, profile=api.profile)
+    else:
+        sql_client = api
+
+    export_started = datetime.now(timezone.utc)
+    previous_state = read_export_state_from_file(artifacts_dir)
+    change_feed_since = None
+    if args.change_feed and not lineage_selector and not args.reuse_catalog:
+        change_feed_since = plan_change_feed(previous_state, api.dremio_url, export_filter, args.full_crawl_interval,
+                                             export_started, artifacts_dir)
+
+    columns_job = None
+    model_files = None
+    if args.column_metadata and not lineage_selector:
+        # One bulk query for the columns of all datasets instead of one catalog request per dataset
+        columns_job = dremio_collect_columns.submit_columns_query(api, sql_client, selector)
+
+    if change_feed_since is not None:
+        with api.profile.phase('change_feed'):
+            catalog_store, pdss = export_catalog_changes(api, sql_client, selector, change_feed_since, output_dir, args.max_workers,
+                                          args.jobs_table, artifacts_dir)
+    else:
+        if lineage_selector:
+            # The system tables are queried for the collected lineage closure only
+            views_job, reflections_job = None, None
+        else:
+            # Submit the system table queries up front, so they run on Dremio while the catalog is traversed
+            views_job = sql_client.submit_sql_query('SELECT * FROM sys.views ' + selector.build_sys_views_filter())
+            reflections_job = sql_client.submit_sql_query('SELECT * FROM sys.reflections ' + selector.build_sys_reflections_filter())
+
+        view_rows = None
+        views_spool = None
+        if args.sql_lineage and not lineage_selector and not args.reuse_catalog:
+            # The SQL definitions are needed before the traversal, so the lineage of the views can be derived from them
+            with api.profile.phase('planning'):
+                view_rows = list(views_job.iter_rows(args.max_workers))
+
+        if args.full_metadata or lineage_selector:
+            dataset_ids = None
+        elif view_rows is not None:
+            with api.profile.phase('planning'):
+                dataset_ids = plan_export_dataset_ids(view_rows, reflections_job.get_data())
+            api.profile.set('planned_datasets', len(dataset_ids))
+        else:
+            # The plan is built in the background while the containers are traversed, only dataset work items wait
+            # for it. The sys.views rows are spooled to disk on the way, so the models are rendered from them without
+            # querying sys.views again or holding the SQL definitions in memory.
+            views_spool = os.path.join(artifacts_dir, 'dremio_views.ndjson')
+
+            def plan() -> set[str]:
+                planned = plan_export_dataset_ids(spool_view_rows(views_job.iter_rows(args.max_workers), views_spool),
+                                                  reflections_job.get_data())
+                api.profile.set('planned_datasets', len(planned))
+                return planned
+
+            planner = ThreadPoolExecutor(max_workers=1, thread_name_prefix=threading.current_thread().name)
+            dataset_ids = planner.submit(plan)
+            planner.shutdown(wait=False)
+
+        shard_pool = None
+        shard_roots = []
+        if args.shards > 1 and not lineage_selector:
+            shard_roots = partition_catalog_roots(api.get_catalog(), selector, args.shards)
+            shard_pool = ProcessPoolExecutor(max_workers=len(shard_roots)) if shard_roots else None
+            logger.info(f"Exporting {sum(len(roots) for roots in shard_roots)} spaces and sources in {len(shard_roots)} shards")
+
+        if not args.reuse_catalog:
+            snapshot = read_catalog_snapshot_from_file(artifacts_dir) if args.incremental else None
+            with api.profile.phase('traversal'):
+                if lineage_selector:
+                    catalog_store = write_lineage_catalog_to_file(api, lineage_selector, args.max_workers, snapshot,
+                                                                  args.full_metadata, artifacts_dir)
+                elif shard_pool is not None:
+                    catalog_store = write_catalog_shards(api, api_args, shard_pool, shard_roots, selector, args.max_workers,
+                                                         snapshot, dataset_ids, args.resume, view_rows, artifacts_dir)
+                else:
+                    catalog_store = write_catalog_entries_to_file(api, selector, args.max_workers, snapshot, dataset_ids,
+                                                                  args.resume, view_rows, artifacts_dir)
+            with api.profile.phase('catalog_artifacts'):
+                write_catalog_lookup_to_file(catalog_store, artifacts_dir)
+                write_catalog_snapshot_to_file(catalog_store, artifacts_dir)
+        else: # for local debugging
+            catalog_store = NdjsonCatalogReader(os.path.join(artifacts_dir, 'dremio_catalog.ndjson'))
+            logger.info(f"Reusing dremio_catalog.ndjson with {len(catalog_store)} entries")
+
+        if lineage_selector:
+            views_job = sql_client.submit_sql_query('SELECT * FROM sys.views '
+                                             + dremio_collect_lineage.build_sys_id_filter('view_id', catalog_store))
+            reflections_job = sql_client.submit_sql_query('SELECT * FROM sys.reflections '
+                                                   + dremio_collect_lineage.build_sys_id_filter('dataset_id', catalog_store))
+            if args.column_metadata:
+                columns_job = dremio_collect_columns.submit_dataset_columns_query(
+                    sql_client, [catalog_store.get(c).object_path for c in catalog_store])
+
+        # PDS parents of all views in first-seen order, each is refreshed once per dbt run
+        pdss = {}
+        model_writer = ModelWriter(os.path.join(str(output_dir), "models"))
+
+        # Stream full list of views and SQL definitions from system table
+        api.profile.start_phase('views')
+        if views_spool is not None:
+            # Raises errors of the planning, and ensures the spool is complete
+            dataset_ids.result()
+            view_rows = read_spooled_view_rows(views_spool)
+        elif view_rows is None:
+            view_rows = views_job.iter_rows(args.max_workers)
+        if shard_pool is not None:
+            write_view_models_sharded(view_rows, catalog_store, shard_pool, shard_roots, output_dir, model_writer, pdss,
+                                      artifacts_dir)
+        else:
+            for row in view_rows:
+                pds_paths = write_view_model(row, catalog_store, output_dir, model_writer)
+                pdss.update(dict.fromkeys(tuple(pds) for pds in pds_paths))
+        if views_spool is not None:
+            os.remove(views_spool)
     
-    # Retrieve full list of reflections and SQL definitions from system table
-    where_clause = build_sys_reflections_filter(space_selector)
-    job_id = api.post_sql_query('SELECT * FROM sys.reflections ' + where_clause)
-    reflections = api.get_query_data(job_id)
-
-    for r in reflections['rows']:
-        reflection_name = r['reflection_name']
-        reflection_id = r['reflection_id']
-        reflection_type = r['type']
-        dataset_id = r['dataset_id']
-        dataset_name = r['dataset_name']
-        dataset_type = r['dataset_type']
-        display_columns = r['display_columns']
-        sort_columns = r['sort_columns']
-        partition_columns = r['partition_columns']
-        dimensions = r['dimensions']
-        measures = r['measures']
-        try:
-            dataset_path = catalog_lookup[dataset_id]['object_path']
-            ref = generate_path_str(dataset_path)
-        except Exception as e:
-            #logger.error(f"Lookup entry not found for {dataset_name} - {dataset_id}")
-            continue
+        api.profile.end_phase('views')
+        if shard_pool is not None:
+            shard_pool.shutdown()
 
-        if reflection_type == 'RAW':
-            refl_type = 'raw'
-        elif reflection_type == 'AGGREGATION':
-            refl_type = 'aggregate'
-        else:
-            logger.error(f"Unsupported reflection type {reflection_type} for dataset {dataset_name}")
-            continue
+        # Retrieve full list of reflections and SQL definitions from system table
+        api.profile.start_phase('reflections')
+        reflections = reflections_job.get_data()
 
-        dbt_config = {
-            'reflection_name': reflection_name,
-            'reflection_type': refl_type,
-            'display': display_columns,
-            'dimensions': dimensions,
-            'measures': measures,
-            'computations': None, # TODO
-            'localsort_by': sort_columns,
-            'partition_by': partition_columns,
-        }
-        config = generate_config(dbt_config, [ref])
+        for r in reflections['rows']:
+            write_reflection_model(r, catalog_store, output_dir, model_writer)
 
-        refl_path = str(output_dir) + "/models/" + "/".join(dataset_path[:-1])
-        refl_name = refl_path + "/REFL_" + reflection_name.replace(" ", "").lower() + "_" + reflection_id[:8] + ".sql"
+        api.profile.end_phase('reflections')
 
-        with open(refl_name, "w") as file:
-            file.write(config)
+        with api.profile.phase('model_files'):
+            for counter, value in model_writer.close(delete_stale=args.delete_stale_models).items():
+                api.profile.set(f'model_files_{counter}', value)
+        model_files = model_writer.model_files
 
     data_sources = set()
 
@@ -292,14 +795,170 @@ if __name__ == '__main__':
         # logger.info(pds)
         data_sources.add(pds[0])
 
-    with open(os.path.join(dir_path, "pds_promote.sql"), 'w') as f:
-        sql_txt = ""
-        for pds in pdss:
-            pds_path = '"' + '"."'.join(pds) + '"'
-            sql_txt += f'ALTER PDS {pds_path} REFRESH METADATA AUTO PROMOTION;\n'
-        f.write(sql_txt)
-        logger.info(f"Created pds_promote.sql with {len(pdss)} entries")
+    write_pds_promote(pdss, output_dir, artifacts_dir)
+
+    if columns_job is not None:
+        with api.profile.phase('columns'):
+            api.profile.set('column_metadata_datasets',
+                            write_column_properties(catalog_store, pdss, columns_job, output_dir, model_files,
+                                                    args.max_workers))
     
     logger.info("Data sources found:")
     for d in data_sources:
         logger.info(d)
+
+    if not args.reuse_catalog:
+        write_export_state_to_file({
+            'dremio_url': api.dremio_url,
+            'export_filter': export_filter,
+            'last_export': export_started.isoformat(),
+            'last_full_export': previous_state['last_full_export'] if change_feed_since else export_started.isoformat()
+        }, artifacts_dir)
+    return api.profile
+
+
+def export_targets(args, export_filter: dict, targets: list[dict]) -> dict:
+    """
+    Export several Dremio environments concurrently, each with its own API client, connection pool and rate limit.
+    The catalog artifacts of a target are written to its output directory.
+
+    Returns:
+        A summary with the status and run profile of every target
+    """
+    output_dirs = [os.path.abspath(target['output_dir']) for target in targets]
+    if len(set(output_dirs)) != len(output_dirs):
+        raise ValueError("Every export target needs its own output_dir")
+
+    def export(target: dict) -> dict:
+        name = target.get('name', target['dremio_endpoint'])
+        # Worker threads are named after the thread that creates their pool, so every log record of the target
+        # carries its name
+        thread = threading.current_thread()
+        pool_thread_name, thread.name = thread.name, name
+        logger.info(f"Exporting target {name} from {target['dremio_endpoint']} to {target['output_dir']}")
+        try:
+            # PATs can be kept out of the targets file in an environment variable
+            dremio_pat = target['dremio_pat'] if 'dremio_pat' in target else os.environ[target['dremio_pat_env']]
+            os.makedirs(target['output_dir'], exist_ok=True)
+            profile = export_target(args, export_filter, target['dremio_endpoint'], dremio_pat, target['output_dir'],
+                                    target['output_dir'], target.get('flight_endpoint'))
+            return {"name": name, "status": "succeeded", "profile": profile.to_dict()}
+        except Exception as e:
+            logger.exception(f"Export of target {name} failed")
+            return {"name": name, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+        finally:
+            thread.name = pool_thread_name
+
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter("%(levelname)s\t%(asctime)s - [%(threadName)s] %(message)s"))
+    executor = ThreadPoolExecutor(max_workers=len(targets))
+    futures = [executor.submit(export, target) for target in targets]
+    try:
+        results = [future.result() for future in futures]
+    except BaseException:
+        # SIGTERM only interrupts the main thread, the targets stop their traversals and keep their checkpoints
+        logger.warning("Export interrupted, stopping the catalog traversals of all targets")
+        dremio_collect_catalog.stop_traversals()
+        executor.shutdown()
+        raise
+    executor.shutdown()
+
+    logger.info("Export summary:")
+    for result in results:
+        if result["status"] == "failed":
+            logger.info(f"  {result['name']}: failed - {result['error']}")
+            continue
+        profile = result["profile"]
+        counters = profile["counters"]
+        errors = sum(e["errors"] for e in profile["endpoints"].values())
+        logger.info(f"  {result['name']}: {profile['wall_time_s']:.1f}s, {profile['requests']} requests, {errors} errors, "
+                    f"{counters.get('datasets_visited', 0)} datasets, {counters.get('model_files_written', 0)} models written")
+    return {"targets": results}
+
+
+def parse_cli_args():
+    parser = argparse.ArgumentParser(description='Dremio dbt exporter')
+    parser.add_argument('--export-filter-json', type=str,
+                        help='Absolute path to export_filter.json file.',
+                        required=True)
+    parser.add_argument('--dremio-endpoint', type=str, help='Dremio URL incl. https:// prefix', required=False)
+    parser.add_argument('--dremio-pat', type=str, help='Dremio PAT', required=False)
+    parser.add_argument('--output-dir', type=str, help='Output directory of dbt models', required=False)
+    parser.add_argument('--targets-json', type=str,
+                        help='JSON list of export targets with dremio_endpoint, dremio_pat (or dremio_pat_env), '
+                             'output_dir and optionally name and flight_endpoint, exported concurrently',
+                        required=False)
+    parser.add_argument('--flight-endpoint', type=str,
+                        help='Arrow Flight location for the system table queries, e.g. grpc+tls://<DREMIO_HOST>:32010 (requires pyarrow)',
+                        required=False)
+    parser.add_argument('--max-workers', type=int, default=1,
+                        help='Number of concurrent catalog requests during traversal (default: 1)', required=False)
+    dremio_api.add_api_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse tags, wikis and lineage of datasets whose version did not change since the previous run',
+                        required=False)
+    parser.add_argument('--delete-stale-models', action='store_true',
+                        help='Delete .sql files in the models directory that are no longer part of the export',
+                        required=False)
+    parser.add_argument('--profile-out', type=str,
+                        help='Write request statistics per endpoint, phase timings and progress counters as JSON to this file',
+                        required=False)
+    parser.add_argument('--reuse-catalog', action='store_true',
+                        help='Skip the catalog traversal and reuse dremio_catalog.ndjson of a previous run (for debugging)',
+                        required=False)
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Number of worker processes that traverse and render disjoint sets of spaces and sources (default: 1)',
+                        required=False)
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted catalog traversal from dremio_catalog_checkpoint.ndjson',
+                        required=False)
+    parser.add_argument('--column-metadata', action='store_true',
+                        help='Export column names and types of the views and PDSs to models/dremio_columns.yml, '
+                             'using one bulk INFORMATION_SCHEMA query')
+    parser.add_argument('--change-feed', action='store_true',
+                        help='Patch the previous export with the DDL changes in the jobs history since it ran, instead '
+                             'of crawling the catalog', required=False)
+    parser.add_argument('--full-crawl-interval', type=float, default=168,
+                        help='Hours after which --change-feed runs a full crawl again (default: 168)', required=False)
+    parser.add_argument('--jobs-table', type=str, default='sys.jobs_recent',
+                        help='System table with the jobs history read by --change-feed (default: sys.jobs_recent)',
+                        required=False)
+    parser.add_argument('--sql-lineage', action='store_true',
+                        help='Derive the parents of views from their SQL in sys.views instead of one /graph request per view',
+                        required=False)
+    parser.add_argument('--full-metadata', action='store_true',
+                        help='Retrieve tags, wikis and lineage for all traversed datasets, not only for exported ones',
+                        required=False)
+    cli_args = parser.parse_args()
+    if not cli_args.targets_json and not (cli_args.dremio_endpoint and cli_args.dremio_pat):
+        parser.error("either --dremio-endpoint and --dremio-pat or --targets-json is required")
+    return cli_args
+
+if __name__ == '__main__':
+
+    args = parse_cli_args()
+    # CI timeouts stop the export with SIGTERM, exit through the regular cleanup so the traversal checkpoint is kept
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    with open(args.export_filter_json, 'r') as f:
+        export_filter = json.load(f)
+
+    if args.targets_json:
+        with open(args.targets_json, 'r') as f:
+            targets = json.load(f)
+        summary = export_targets(args, export_filter, targets)
+        failed = [result["name"] for result in summary["targets"] if result["status"] == "failed"]
+    else:
+        output_dir = args.output_dir if args.output_dir else dir_path
+        summary = export_target(args, export_filter, args.dremio_endpoint, args.dremio_pat, output_dir,
+                                flight_endpoint=args.flight_endpoint).to_dict()
+        failed = []
+
+    if args.profile_out:
+        with open(args.profile_out, 'w') as f:
+            json.dump(summary, f, indent=2)
+            logger.info(f"Created run profile {args.profile_out}")
+
+    if failed:
+        logger.error(f"Export failed for {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWriter:
+    """
+    Write dbt model files through a small thread pool, skipping files whose content did not change so that their
+    mtimes are preserved for dbt partial parsing and git-based CI
+    """
+
+    def __init__(self, models_dir: str, max_workers=4):
+        self.models_dir = os.path.abspath(models_dir)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name)
+        self.futures = []
+        self.created_dirs = set()
+        self.model_files = set()
+        self.lock = threading.Lock()
+        self.written = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    def write(self, filename: str, content: str):
+        filename = os.path.abspath(filename)
+        self.model_files.add(filename)
+        self.futures.append(self.executor.submit(self._write_file, filename, content))
+
+    def _write_file(self, filename: str, content: str):
+        data = content.encode('utf-8')
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                    with self.lock:
+                        self.unchanged += 1
+                    return
+        else:
+            directory = os.path.dirname(filename)
+            if directory not in self.created_dirs:
+                os.makedirs(directory, exist_ok=True)
+                with self.lock:
+                    self.created_dirs.add(directory)
+        with open(filename, 'wb') as f:
+            f.write(data)
+        with self.lock:
+            self.written += 1
+
+    def merge(self, summary: dict, model_files: set):
+        """
+        Account for the files written by another ModelWriter, e.g. in an export shard, so they are neither counted
+        twice nor deleted as stale
+        """
+        with self.lock:
+            self.model_files.update(model_files)
+            self.written += summary["written"]
+            self.unchanged += summary["unchanged"]
+
+    def delete_stale_models(self):
+        """
+        Remove .sql files below the models directory that were not written in this run, as well as folders left empty
+        """
+        for root, dirs, files in os.walk(self.models_dir, topdown=False):
+            for name in files:
+                filename = os.path.join(root, name)
+                if name.endswith('.sql') and filename not in self.model_files:
+                    logger.debug(f"Deleting stale model {filename}")
+                    os.remove(filename)
+                    self.deleted += 1
+            if root != self.models_dir and len(os.listdir(root)) == 0:
+                os.rmdir(root)
+
+    def close(self, delete_stale=False) -> dict:
+        self.executor.shutdown(wait=True)
+        for future in self.futures:
+            # Re-raise errors of the write tasks
+            future.result()
+        if delete_stale:
+            self.delete_stale_models()
+        summary = {"written": self.written, "unchanged": self.unchanged, "deleted": self.deleted}
+        logger.info(f"Model files: {self.written} written, {self.unchanged} unchanged, {self.deleted} deleted")
+        return summary
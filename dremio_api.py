@@ -1,55 +1,401 @@
+import argparse
+import itertools
+import json
 import logging
+import random
+import threading
+import time
+import urllib.parse
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from dremio_cache import ResponseCache
+from dremio_profile import RunProfile
 
 logger = logging.getLogger(__name__)
 
+# Status codes that indicate a transient coordinator condition and are safe to retry
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+def add_api_arguments(parser: argparse.ArgumentParser):
+    """
+    Add the options of the Dremio REST client, shared by the command line tools
+    """
+    parser.add_argument('--pool-size', type=int, default=10,
+                        help='Maximum number of pooled HTTP connections per Dremio environment (default: 10)', required=False)
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help='Retries for transient errors (429, 502, 503, 504, connection errors) (default: 5)', required=False)
+    parser.add_argument('--max-children', type=int, default=1000,
+                        help='Page size of folder, space and source listings, 0 disables paging (default: 1000)',
+                        required=False)
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help='Maximum number of Dremio REST requests per second per environment, across all workers',
+                        required=False)
+    parser.add_argument('--adaptive-timeouts', action='store_true',
+                        help='Derive the timeout of GET requests from the recent p99 latency of their endpoint, '
+                             'capped at the fixed 60s timeout', required=False)
+    parser.add_argument('--hedge-ratio', type=float, default=0.0,
+                        help='Send a GET again when it exceeds the p95 latency of its endpoint, for at most this '
+                             'share of GETs, e.g. 0.05 (default: 0, disabled)', required=False)
+
+
+def build_api_args(args, dremio_url: str, dremio_pat: str) -> dict:
+    """
+    Returns:
+        The DremioAPI keyword arguments for the options added by add_api_arguments. The pool holds at least one
+        connection per traversal worker and per worker paging the sys.views results of the planning, which runs
+        alongside the traversal, plus one for the planning itself.
+    """
+    return {
+        'dremio_pat': dremio_pat,
+        'dremio_url': dremio_url,
+        'timeout': 60,
+        'pool_size': max(args.pool_size, 2 * args.max_workers + 1),
+        'max_retries': args.max_retries,
+        'max_children': args.max_children or None,
+        'adaptive_timeouts': args.adaptive_timeouts,
+        'hedge_ratio': args.hedge_ratio,
+        'rate_limit': args.rate_limit
+    }
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that limits the request rate across all threads sharing a DremioAPI instance
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst if burst else max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def try_acquire(self) -> bool:
+        """
+        Returns:
+            Whether a token was taken, without waiting for one
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# Adaptive timeouts of GET requests: a multiple of the endpoint's p99 latency, at least MIN_ADAPTIVE_TIMEOUT seconds
+# and at most the configured timeout. Each retry of a timed-out request doubles the timeout.
+ADAPTIVE_TIMEOUT_FACTOR = 4
+MIN_ADAPTIVE_TIMEOUT = 5.0
+
+
+class LatencyTracker:
+    """
+    Sliding window of the most recent response latencies per endpoint class, from which timeouts and hedging
+    delays are derived
+    """
+
+    def __init__(self, window=500, min_samples=20):
+        self.window = window
+        # Percentiles of fewer samples are too noisy to act on
+        self.min_samples = min_samples
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float):
+        with self.lock:
+            if endpoint not in self.samples:
+                self.samples[endpoint] = deque(maxlen=self.window)
+            self.samples[endpoint].append(latency)
+
+    def percentile(self, endpoint: str, q: float) -> float:
+        """
+        Returns:
+            The q-th percentile (0 < q < 1) of the endpoint's recent latencies, or None if there are too few samples
+        """
+        with self.lock:
+            samples = self.samples.get(endpoint)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
 class DremioAPI:
 
-    def __init__(self, dremio_pat: str, dremio_url: str, timeout=10, verify=False):
+    def __init__(self, dremio_pat: str, dremio_url: str, timeout=10, verify=False,
+                 pool_size=10, max_retries=5, backoff_factor=0.5, rate_limit=None, max_children=None,
+                 cache_ttl=3600.0, cache_size=1000, adaptive_timeouts=False, hedge_ratio=0.0):
         self.dremio_url = dremio_url.rstrip("/")
+        # Catalog lookups that repeat within the run, by path and entity, and the top-level listing
+        self.cache = ResponseCache(cache_size, cache_ttl)
+        # Page size of container listings, None lets Dremio decide
+        self.max_children = max_children
         self.timeout = timeout
         self.verify = verify
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.latencies = LatencyTracker()
+        self.adaptive_timeouts = adaptive_timeouts
+        # GETs that are slower than the endpoint's p95 are sent a second time, for at most this share of the GETs
+        self.hedge_ratio = hedge_ratio
+        self.hedge_lock = threading.Lock()
+        self.hedgeable_requests = 0
+        self.hedged_requests = 0
+        self.hedge_executor = ThreadPoolExecutor(max_workers=2 * pool_size,
+                                                 thread_name_prefix=threading.current_thread().name) if hedge_ratio > 0 else None
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': 'Bearer ' + dremio_pat
         }
-        # Validate token
-        response = requests.request("GET", self.dremio_url + '/api/v3/catalog', headers=self.headers, timeout=self.timeout, verify=self.verify)
+        # Shared keep-alive session, so concurrent requests reuse pooled connections instead of new TCP/TLS handshakes
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.verify = self.verify
+        # Requests sent by the hedging threads need connections in addition to those sent by the callers
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=3 * pool_size if hedge_ratio > 0 else pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.profile = RunProfile()
+        # Validate token, the top-level listing is reused by the traversal
+        response = self._request("GET", self.dremio_url + '/api/v3/catalog', endpoint='catalog')
         if response.status_code != 200:
             raise Exception(f"Unable to log into {self.dremio_url}. Please validate endpoint and PAT.")
+        self.cache.put(self._cache_key('catalog', ""), response.text)
+
+    def _request(self, method: str, url: str, endpoint='other', **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session, retrying transient errors with exponential backoff and jitter
+
+        Args:
+            endpoint: The endpoint class the request is recorded under in the run profile
+
+        Returns:
+            The final response, which may still carry a retryable status code once all retries are exhausted
+        """
+        adaptive = self.adaptive_timeouts and method == "GET" and 'timeout' not in kwargs
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            if adaptive:
+                kwargs['timeout'] = self._adaptive_timeout(endpoint, attempt)
+            start = time.perf_counter()
+            try:
+                response = self._send(method, url, endpoint, kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.profile.record_request(endpoint, time.perf_counter() - start, 0, error=True)
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug(f"{method} {url} failed with {e}")
+                retry_after = None
+            else:
+                self.profile.record_request(endpoint, time.perf_counter() - start, len(response.content),
+                                            error=response.status_code >= 500 or response.status_code == 429)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                logger.debug(f"{method} {url} returned {response.status_code}")
+                retry_after = response.headers.get('Retry-After')
+            delay = self.backoff_factor * (2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            delay = random.uniform(delay / 2, delay)
+            attempt += 1
+            self.profile.record_retry(endpoint)
+            logger.info(f"Retrying {method} {url} in {delay:.1f}s (attempt {attempt} of {self.max_retries})")
+            time.sleep(delay)
+
+    def _adaptive_timeout(self, endpoint: str, attempt: int) -> float:
+        p99 = self.latencies.percentile(endpoint, 0.99)
+        if p99 is None:
+            return self.timeout
+        return min(self.timeout, max(MIN_ADAPTIVE_TIMEOUT, ADAPTIVE_TIMEOUT_FACTOR * p99) * 2 ** attempt)
+
+    def _send(self, method: str, url: str, endpoint: str, kwargs: dict) -> requests.Response:
+        """
+        Send one attempt of a request. A GET that has not completed within the endpoint's p95 latency is sent again
+        if the hedging budget and the rate limit allow, and the first response without a transient error is used.
+        """
+        hedge_delay = None
+        if self.hedge_executor is not None and method == "GET":
+            hedge_delay = self.latencies.percentile(endpoint, 0.95)
+        if hedge_delay is None:
+            return self._send_once(method, url, endpoint, kwargs)
+
+        with self.hedge_lock:
+            self.hedgeable_requests += 1
+        started_at = {}
+        primary = self.hedge_executor.submit(self._send_once, method, url, endpoint, kwargs)
+        started_at[primary] = time.perf_counter()
+        try:
+            return primary.result(timeout=hedge_delay)
+        except FutureTimeoutError:
+            pass
+        with self.hedge_lock:
+            # A hedge is skipped rather than delayed when the rate limit has no token left
+            if self.hedged_requests >= self.hedge_ratio * self.hedgeable_requests or \
+                    (self.rate_limiter and not self.rate_limiter.try_acquire()):
+                hedge = None
+            else:
+                self.hedged_requests += 1
+                hedge = self.hedge_executor.submit(self._send_once, method, url, endpoint, kwargs)
+                started_at[hedge] = time.perf_counter()
+        if hedge is None:
+            return primary.result()
+        self.profile.increment('hedged_requests')
+        logger.debug(f"Hedging {method} {url} after {hedge_delay:.2f}s")
+
+        used = None
+        for future in as_completed([primary, hedge]):
+            if future.exception() is None and future.result().status_code not in RETRY_STATUS_CODES:
+                used = future
+                break
+            # Without a usable response, a response with a transient error is returned for a retry rather than an
+            # exception
+            if used is None or used.exception() is not None:
+                used = future
+        if used is hedge:
+            self.profile.increment('hedge_wins')
+        # The other request is not cancelled. _request records the used response, the other one is recorded here once
+        # it completes.
+        other = primary if used is hedge else hedge
+        other.add_done_callback(lambda f: self._record_unused(endpoint, f, started_at[f]))
+        return used.result()
+
+    def _record_unused(self, endpoint: str, future, started_at: float):
+        if future.exception() is not None:
+            self.profile.record_request(endpoint, time.perf_counter() - started_at, 0, error=True)
+            return
+        response = future.result()
+        self.profile.record_request(endpoint, time.perf_counter() - started_at, len(response.content),
+                                    error=response.status_code >= 500 or response.status_code == 429)
+
+    def _send_once(self, method: str, url: str, endpoint: str, kwargs: dict) -> requests.Response:
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.Timeout:
+            # A timeout is a lower bound of the latency, recording it lets the timeout adapt to a slower coordinator
+            self.latencies.record(endpoint, time.perf_counter() - start)
+            raise
+        self.latencies.record(endpoint, time.perf_counter() - start)
+        return response
+
+    def _cache_key(self, endpoint: str, entity: str) -> str:
+        return f"{self.dremio_url}|{endpoint}|{entity}"
+
+    def _get_cached(self, endpoint: str, entity: str, fetch):
+        """
+        Return the cached response for the entity, or call fetch and cache its response
+
+        Args:
+            fetch: Function returning a tuple of the response and whether it may be cached, errors are not cached
+        """
+        key = self._cache_key(endpoint, entity)
+        value = self.cache.get(key)
+        if value is not None:
+            self.profile.increment('cache_hits')
+            return json.loads(value)
+        self.profile.increment('cache_misses')
+        data, cacheable = fetch()
+        if cacheable:
+            self.cache.put(key, json.dumps(data))
+        return data
 
     def get_dataset_id(self, dataset: str):
         dataset_path = dataset.replace(".", "/").replace('"', '')
         url = self.dremio_url + '/api/v3/catalog/by-path/'  + dataset_path
 
-        logger.info(f"Getting ID of {dataset}")
-        response = requests.request("GET", url, headers=self.headers, timeout=self.timeout, verify=self.verify)
-        data = response.json()
-        try:
-            dataset_id = data["id"]
-        except KeyError:
-            logger.warning(data)
-            logger.warning(f"Dataset ID for {dataset_path} not found")
-            dataset_id = ""
-        return dataset_id
+        def fetch():
+            logger.info(f"Getting ID of {dataset}")
+            response = self._request("GET", url, endpoint='catalog')
+            data = response.json()
+            try:
+                return data["id"], True
+            except KeyError:
+                logger.warning(data)
+                logger.warning(f"Dataset ID for {dataset_path} not found")
+                return "", False
+
+        return self._get_cached('dataset-id', dataset_path, fetch)
 
     def get_catalog(self, catalog_id=""):
-        response = requests.get(
-            self.dremio_url + f'/api/v3/catalog/{catalog_id}',
-            headers=self.headers, timeout=self.timeout, verify=self.verify
-            )
-        data = response.json()
-        return data
+        endpoint = 'graph' if catalog_id.endswith('/graph') else 'catalog'
+
+        def fetch():
+            response = self._request("GET", self.dremio_url + f'/api/v3/catalog/{catalog_id}', endpoint=endpoint)
+            return response.json(), response.status_code == 200
+
+        if endpoint == 'graph':
+            # Lineage is retrieved once per view
+            return fetch()[0]
+        return self._get_cached('catalog', catalog_id, fetch)
+
+    def get_catalog_page(self, catalog_id: str, page_token=None):
+        """
+        Retrieve a container with one page of its children. The response contains a nextPageToken if more children
+        follow.
+        """
+        params = {}
+        if self.max_children:
+            params['maxChildren'] = self.max_children
+        if page_token:
+            params['pageToken'] = page_token
+
+        # Every page is retrieved once per traversal, so pages are not cached
+        response = self._request("GET", self.dremio_url + f'/api/v3/catalog/{catalog_id}', endpoint='catalog',
+                                 params=params)
+        return response.json()
+
+    def get_catalog_by_path(self, path: list[str], cached=True):
+        """
+        Args:
+            cached: Whether a cached response may be returned, pass False to see changes made within the cache TTL
 
-    def get_query_info(self, job_id: str):
+        Returns:
+            The catalog entity at the given path, or None if it does not exist
+        """
+        url = self.dremio_url + '/api/v3/catalog/by-path/' + '/'.join(urllib.parse.quote(p, safe='') for p in path)
+
+        def fetch():
+            response = self._request("GET", url, endpoint='catalog')
+            if response.status_code == 404:
+                return None, False
+            if response.status_code != 200:
+                raise Exception(f"Catalog entity {path} could not be retrieved: {response.status_code} {response.text}")
+            return response.json(), True
+
+        if not cached:
+            return fetch()[0]
+        return self._get_cached('by-path', json.dumps(path), fetch)
+
+    def get_query_info(self, job_id: str, poll_interval=0.1, max_poll_interval=2.0):
+        return self.wait_for_job(job_id, poll_interval, max_poll_interval)['jobState']
+
+    def wait_for_job(self, job_id: str, poll_interval=0.1, max_poll_interval=2.0) -> dict:
         logger.debug("Waiting for job completion...")
         while True:
-            response = requests.get(
-                self.dremio_url + '/api/v3/job/' + job_id,
-                headers=self.headers,
-                timeout=self.timeout,
-                verify=self.verify
-            )
+            response = self._request("GET", self.dremio_url + '/api/v3/job/' + job_id, endpoint='job_poll')
             data = response.json()
             job_state = data['jobState']
             if job_state == 'COMPLETED':
@@ -59,47 +405,91 @@ class DremioAPI:
                 status = job_state + " - " + data.get("errorMessage", "")
                 logger.warning(status)
                 break
-        return job_state
+            # Short jobs are picked up quickly, long-running jobs are polled less and less frequently
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+        return data
 
-    def post_sql_query(self, sql: str):
+    def submit_sql_query(self, sql: str) -> "DremioJob":
+        """
+        Submit a SQL query without waiting for its completion
+
+        Args:
+            sql: The SQL statement to run
+
+        Returns:
+            A DremioJob handle to collect the query results later
+        """
         logger.info(sql)
-        response = requests.post(
-            self.dremio_url + '/api/v3/sql', 
-            headers=self.headers,
-            json={"sql": sql },
-            timeout=self.timeout, verify=self.verify
-        )
+        response = self._request("POST", self.dremio_url + '/api/v3/sql', endpoint='sql', json={"sql": sql})
         job_id = response.json()['id']
-        self.get_query_info(job_id)
-        return job_id
+        return DremioJob(self, job_id)
+
+    def post_sql_query(self, sql: str):
+        job = self.submit_sql_query(sql)
+        job.wait()
+        return job.job_id
     
-    def get_query_data(self, job_id: str, limit=500) -> dict:
-        job_state = self.get_query_info(job_id)
+    def get_query_data(self, job_id: str, limit=500, max_workers=1) -> dict:
+        rows = []
+        columns = []
+        for page in self.iter_query_pages(job_id, limit, max_workers):
+            rows.extend(page['rows'])
+            columns = page.get('columns', columns)
+        return {"rows": rows, "columns": columns}
+
+    def iter_query_data(self, job_id: str, limit=500, max_workers=1):
+        """
+        Stream the result rows of a job as the result pages arrive
+
+        Args:
+            job_id: The ID of the job
+            limit: The number of rows per result page (at most 500)
+            max_workers: The number of result pages requested concurrently
+
+        Returns:
+            A generator yielding the result rows in order
+        """
+        for page in self.iter_query_pages(job_id, limit, max_workers):
+            yield from page['rows']
+
+    def iter_query_pages(self, job_id: str, limit=500, max_workers=1):
+        job = self.wait_for_job(job_id)
+        job_state = job['jobState']
+        if job_state != 'COMPLETED':
+            raise Exception(f'Query data could not be retrieved - Incorrect Job State: {job_state}')
 
-        if job_state == 'COMPLETED':
-            rows = []
-            new_rows = ['init_dummy']
+        row_count = job.get('rowCount')
+        if row_count is None or max_workers <= 1:
             current_offset = 0
-            job_results_json = {}
-            while len(new_rows) > 0:
-                page = 'offset=' + str(current_offset) + '&limit=' + str(limit)
-                logger.debug("Paging " + page)
-                job_results = requests.get(
-                    self.dremio_url + '/api/v3/job/' + job_id + '/results?' + page,
-                    headers=self.headers,
-                    timeout=self.timeout,
-                    verify=self.verify
-                )
-                if job_results.status_code != 200:
-                    Exception(f'Error - {job_results.text}')
-                job_results_json = job_results.json()
-                new_rows = job_results_json['rows']
-                current_offset += len(new_rows)
-                rows.extend(new_rows)
-            columns = job_results_json.get('columns', [])
-            return {"rows": rows, "columns": columns}
+            while True:
+                page = self.get_query_page(job_id, current_offset, limit)
+                if len(page['rows']) == 0:
+                    # The last (empty) page still carries the column definitions
+                    yield page
+                    break
+                current_offset += len(page['rows'])
+                yield page
         else:
-            raise Exception(f'Query data could not be retrieved - Incorrect Job State: {job_state}')
+            # The row count is known, so page ranges are fetched concurrently, keeping at most max_workers pages in memory
+            offsets = iter(range(0, row_count, limit))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+                pending = deque(executor.submit(self.get_query_page, job_id, offset, limit)
+                                for offset in itertools.islice(offsets, max_workers))
+                while pending:
+                    page = pending.popleft().result()
+                    offset = next(offsets, None)
+                    if offset is not None:
+                        pending.append(executor.submit(self.get_query_page, job_id, offset, limit))
+                    yield page
+
+    def get_query_page(self, job_id: str, offset: int, limit=500) -> dict:
+        page = 'offset=' + str(offset) + '&limit=' + str(limit)
+        logger.debug("Paging " + page)
+        job_results = self._request("GET", self.dremio_url + '/api/v3/job/' + job_id + '/results?' + page, endpoint='results')
+        if job_results.status_code != 200:
+            raise Exception(f'Error - {job_results.text}')
+        return job_results.json()
 
     def get_catalog_tags(self, catalog_id: str) -> list[str]:
         """
@@ -114,19 +504,17 @@ class DremioAPI:
         url = self.dremio_url + f'/api/v3/catalog/{catalog_id}/collaboration/tag'
         
         logger.debug(f"Getting tags for catalog ID {catalog_id}")
-        response = requests.get(
-            url, 
-            headers=self.headers, 
-            timeout=self.timeout, 
-            verify=self.verify
-        )
+        response = self._request("GET", url, endpoint='tag')
         
         if response.status_code == 200:
             data = response.json()
             return data.get('tags', [])
-        else:
+        elif response.status_code < 500 and response.status_code not in RETRY_STATUS_CODES:
+            # 404 is returned for entities without tags, other client errors are usually caused by missing privileges
             logger.debug(f"Failed to get tags for catalog ID {catalog_id}: {response.status_code}")
             return []
+        else:
+            raise Exception(f"Failed to get tags for catalog ID {catalog_id}: {response.status_code} - {response.text}")
 
     def get_catalog_wiki(self, catalog_id: str) -> str:
         """
@@ -141,16 +529,36 @@ class DremioAPI:
         url = self.dremio_url + f'/api/v3/catalog/{catalog_id}/collaboration/wiki'
         
         logger.debug(f"Getting wiki for catalog ID {catalog_id}")
-        response = requests.get(
-            url, 
-            headers=self.headers, 
-            timeout=self.timeout, 
-            verify=self.verify
-        )
+        response = self._request("GET", url, endpoint='wiki')
         
         if response.status_code == 200:
             data = response.json()
             return data.get('text', '')
-        else:
+        elif response.status_code < 500 and response.status_code not in RETRY_STATUS_CODES:
+            # 404 is returned for entities without wiki, other client errors are usually caused by missing privileges
             logger.debug(f"Failed to get wiki for catalog ID {catalog_id}: {response.status_code}")
             return ''
+        else:
+            raise Exception(f"Failed to get wiki for catalog ID {catalog_id}: {response.status_code} - {response.text}")
+
+
+class DremioJob:
+    """
+    Handle for a submitted SQL query, so that the query runs on Dremio while the client does other work
+    """
+
+    def __init__(self, api: DremioAPI, job_id: str):
+        self.api = api
+        self.job_id = job_id
+        self.data = None
+
+    def wait(self) -> str:
+        return self.api.get_query_info(self.job_id)
+
+    def get_data(self) -> dict:
+        if self.data is None:
+            self.data = self.api.get_query_data(self.job_id)
+        return self.data
+
+    def iter_rows(self, max_workers=1):
+        return self.api.iter_query_data(self.job_id, max_workers=max_workers)
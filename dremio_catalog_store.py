@@ -0,0 +1,286 @@
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogEntity:
+    """
+    Compact record of a single catalog entity. Parents are stored as catalog IDs only, their paths and types are
+    kept once per parent in the CatalogStore.
+    """
+    __slots__ = ("id", "object_type", "object_path", "parent_ids", "tags", "wiki", "tag")
+
+    def __init__(self, catalog_id: str, object_type: str, object_path, parent_ids=(), tags=None, wiki="", tag=""):
+        self.id = catalog_id
+        self.object_type = object_type
+        self.object_path = tuple(object_path)
+        self.parent_ids = tuple(parent_ids)
+        self.tags = tags if tags else []
+        self.wiki = wiki
+        self.tag = tag
+
+
+class CatalogStore:
+    """
+    ID-indexed store of all collected catalog entities in traversal order, with an adjacency list of parent IDs
+    """
+
+    def __init__(self):
+        self.entities = {}
+        self.parents = {}
+        self.paths = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, catalog_id):
+        return catalog_id in self.entities
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def get(self, catalog_id: str) -> CatalogEntity:
+        return self.entities.get(catalog_id)
+
+    def intern_path(self, path) -> tuple:
+        path = tuple(sys.intern(p) for p in path)
+        with self.lock:
+            return self.paths.setdefault(path, path)
+
+    def add(self, entity: CatalogEntity, parents=()):
+        """
+        Add an entity together with the (id, path, dataset type) tuples of its parents from the lineage graph
+        """
+        entity.object_path = self.intern_path(entity.object_path)
+        self.add_parents(parents)
+        self.entities[entity.id] = entity
+
+    def remove(self, catalog_id: str) -> CatalogEntity:
+        """
+        Remove an entity, references to it from other entities are kept
+        """
+        return self.entities.pop(catalog_id)
+
+    def add_parents(self, parents):
+        for parent_id, parent_path, parent_type in parents:
+            if parent_id not in self.parents:
+                self.parents[parent_id] = (self.intern_path(parent_path), parent_type)
+
+    def set_parents(self, catalog_id: str, parents):
+        """
+        Replace the parents of an entity whose lineage was determined after it was added
+        """
+        self.add_parents(parents)
+        self.entities[catalog_id].parent_ids = tuple(p[0] for p in parents)
+
+    def iter_parents(self, entity: CatalogEntity):
+        """
+        Yield the parents of an entity as dicts with id, name (path) and type, as used in the catalog lookup
+        """
+        return iter_parent_refs(entity, self.get_parent_tuples(entity))
+
+    def get_parent_tuples(self, entity: CatalogEntity) -> list[tuple]:
+        return [(parent_id, *self.parents[parent_id]) for parent_id in entity.parent_ids]
+
+    def iter_items(self):
+        """
+        Yield (entity, parents) tuples in traversal order, as accepted by add and NdjsonCatalogWriter.write
+        """
+        for entity in self.entities.values():
+            yield entity, self.get_parent_tuples(entity)
+
+    def iter_entries(self):
+        """
+        Yield one catalog entry per (entity, parent) pair in traversal order
+        """
+        for entity in self.entities.values():
+            for parent in self.iter_parents(entity):
+                yield {
+                    "id": entity.id,
+                    "object_type": entity.object_type,
+                    "object_path": list(entity.object_path),
+                    "parent": parent["name"],
+                    "parent_id": parent["id"],
+                    "parent_type": parent["type"],
+                    "tags": entity.tags,
+                    "wiki": entity.wiki,
+                    "tag": entity.tag
+                }
+
+    def get_lookup_entry(self, catalog_id: str) -> dict:
+        entity = self.entities[catalog_id]
+        return generate_lookup_entry(entity, self.iter_parents(entity))
+
+    def iter_lookup(self):
+        for catalog_id in self.entities:
+            yield catalog_id, self.get_lookup_entry(catalog_id)
+
+    def generate_snapshot(self) -> dict[dict]:
+        """
+        Build a snapshot of all datasets with a version tag, keyed by catalog ID
+
+        Returns:
+            A dict that can be passed to get_catalog_entries to skip metadata requests for unchanged datasets
+        """
+        snapshot = {}
+        for catalog_id, entity in self.entities.items():
+            if entity.object_type in ["PDS", "VDS"] and entity.tag:
+                snapshot[catalog_id] = self.get_lookup_entry(catalog_id)
+                snapshot[catalog_id]["tag"] = entity.tag
+        return snapshot
+
+    @classmethod
+    def from_lookup(cls, catalog_lookup: dict[dict]) -> "CatalogStore":
+        store = cls()
+        for lookup_entry in catalog_lookup.values():
+            store.add(*catalog_entity_from_lookup_entry(lookup_entry))
+        return store
+
+    @classmethod
+    def from_ndjson(cls, filename: str) -> "CatalogStore":
+        """
+        Load an NDJSON catalog, which unlike the catalog lookup keeps the version tags of the entities
+        """
+        store = cls()
+        with open(filename, 'rb') as f:
+            for line in f:
+                store.add(*catalog_entity_from_lookup_entry(json.loads(line)))
+        return store
+
+
+def iter_parent_refs(entity: CatalogEntity, parents):
+    if len(entity.parent_ids) == 0:
+        if entity.object_type == "PDS":
+            # The parent of a PDS is the source it belongs to
+            yield {"id": "", "name": list(entity.object_path[:1]), "type": "SOURCE"}
+        else:
+            yield {"id": "", "name": [], "type": ""}
+    for parent_id, parent_path, parent_type in parents:
+        yield {"id": parent_id, "name": list(parent_path), "type": parent_type}
+
+
+def generate_lookup_entry(entity: CatalogEntity, parent_refs) -> dict:
+    return {
+        "id": entity.id,
+        "object_path": list(entity.object_path),
+        "object_type": entity.object_type,
+        "parents": list(parent_refs),
+        "tags": entity.tags,
+        "wiki": entity.wiki
+    }
+
+
+def generate_versioned_lookup_entry(entity: CatalogEntity, parents=()) -> dict:
+    """
+    Lookup entry of an entity including its version tag, as stored in NDJSON catalogs and traversal checkpoints
+    """
+    lookup_entry = generate_lookup_entry(entity, iter_parent_refs(entity, parents))
+    lookup_entry["tag"] = entity.tag
+    return lookup_entry
+
+
+def catalog_entity_from_lookup_entry(lookup_entry: dict) -> tuple[CatalogEntity, list]:
+    """
+    Rebuild an entity and its parent tuples from a catalog lookup (or snapshot) entry
+    """
+    parents = [(p["id"], p["name"], p["type"]) for p in lookup_entry["parents"] if p["id"]]
+    entity = CatalogEntity(lookup_entry["id"], lookup_entry["object_type"], lookup_entry["object_path"],
+                           [p[0] for p in parents], lookup_entry["tags"], lookup_entry["wiki"],
+                           lookup_entry.get("tag", ""))
+    return entity, parents
+
+
+class NdjsonCatalogWriter:
+    """
+    Append catalog entities as NDJSON lookup entries (one entity per line) while the catalog is traversed, so a
+    crashed run keeps everything collected so far. An offset index is written next to the file on close.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        if os.path.exists(filename + '.idx'):
+            # A stale index from a previous run must not describe a partially written file
+            os.remove(filename + '.idx')
+        self.file = open(filename, 'wb')
+        self.offsets = {}
+
+    def write(self, entity: CatalogEntity, parents=()):
+        lookup_entry = generate_versioned_lookup_entry(entity, parents)
+        self.offsets[entity.id] = self.file.tell()
+        self.file.write(json.dumps(lookup_entry).encode('utf-8') + b'\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+        with open(self.filename + '.idx', 'w') as f:
+            for catalog_id, offset in self.offsets.items():
+                f.write(f"{catalog_id}\t{offset}\n")
+        logger.info(f"Created {os.path.basename(self.filename)} with {len(self.offsets)} entries")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class NdjsonCatalogReader:
+    """
+    Memory-mapped, read-only view of an NDJSON catalog file. Entities are only parsed when they are looked up, so it
+    can be used in place of a CatalogStore without loading the whole catalog.
+    """
+
+    def __init__(self, filename: str):
+        self.file = open(filename, 'rb')
+        if os.path.getsize(filename) > 0:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+        if os.path.exists(filename + '.idx'):
+            self.offsets = {}
+            with open(filename + '.idx', 'r') as f:
+                for line in f:
+                    catalog_id, offset = line.rstrip('\n').split('\t')
+                    self.offsets[catalog_id] = int(offset)
+        else:
+            # The index is missing if the writing run did not finish, so rebuild it from the complete lines
+            logger.warning(f"No offset index found for {filename}, scanning the file")
+            self.offsets = {}
+            offset = 0
+            while True:
+                end = self.data.find(b'\n', offset)
+                if end < 0:
+                    break
+                self.offsets[json.loads(self.data[offset:end])["id"]] = offset
+                offset = end + 1
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, catalog_id):
+        return catalog_id in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def get_lookup_entry(self, catalog_id: str) -> dict:
+        offset = self.offsets[catalog_id]
+        return json.loads(self.data[offset:self.data.find(b'\n', offset)])
+
+    def get(self, catalog_id: str) -> CatalogEntity:
+        if catalog_id not in self.offsets:
+            return None
+        return catalog_entity_from_lookup_entry(self.get_lookup_entry(catalog_id))[0]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
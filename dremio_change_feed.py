@@ -0,0 +1,153 @@
+import dremio_api
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from dremio_catalog_store import CatalogStore
+from dremio_collect_catalog import collect_dremio_dataset, collect_dremio_lineage, dataset_child_from_entity, select_catalog_roots
+from dremio_selector import SELECTED, CatalogSelector
+from dremio_sql_lineage import keyword, parse_compound_identifier, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Jobs submitted shortly before the previous export started are read again, to tolerate clock skew between the
+# export runner and Dremio. Applying a change twice has no effect.
+CHANGE_FEED_OVERLAP = timedelta(minutes=5)
+
+# Kinds of catalog changes
+DATASET_CHANGED = 'dataset'  # Definition, existence or reflections of a dataset changed
+FOLDER_DROPPED = 'folder'  # All datasets below the path may be gone
+
+VIEW_KEYWORDS = {"VIEW", "VDS"}
+DATASET_KEYWORDS = {"TABLE", "PDS", "DATASET"} | VIEW_KEYWORDS
+
+
+def parse_ddl_change(sql: str) -> tuple:
+    """
+    Determine the catalog path a DDL statement modifies: CREATE [OR REPLACE] VIEW, ALTER VIEW, DROP VIEW,
+    reflection changes through ALTER TABLE/VIEW/PDS/DATASET ... REFLECTION, and DROP FOLDER
+
+    Returns:
+        A tuple of the change kind and the path, or None if the statement does not affect exported models
+    """
+    tokens = tokenize(sql)
+    if not tokens:
+        return None
+    words = [keyword(t) for t in tokens]
+    i = 1
+    if words[0] == "CREATE" and words[1:3] == ["OR", "REPLACE"]:
+        i = 3
+    if i >= len(tokens):
+        return None
+    object_type = words[i]
+    i += 1
+    if words[0] in ("DROP", "CREATE") and words[i:i + 2] == ["IF", "EXISTS"]:
+        i += 2
+    elif words[0] == "CREATE" and words[i:i + 3] == ["IF", "NOT", "EXISTS"]:
+        i += 3
+    path, end = parse_compound_identifier(tokens, i)
+    if not path:
+        return None
+    if words[0] in ("CREATE", "ALTER", "DROP") and object_type in VIEW_KEYWORDS:
+        return DATASET_CHANGED, path
+    if words[0] == "ALTER" and object_type in DATASET_KEYWORDS and "REFLECTION" in words[end:]:
+        return DATASET_CHANGED, path
+    if words[0] == "DROP" and object_type == "FOLDER":
+        return FOLDER_DROPPED, path
+    return None
+
+
+def query_catalog_changes(sql_client, since: datetime, jobs_table='sys.jobs_recent') -> list[tuple]:
+    """
+    Read the DDL statements of the jobs history that completed after the given UTC time
+
+    Returns:
+        The (kind, path) tuples of the changes in the order they were submitted
+    """
+    sql = (f"SELECT query FROM {jobs_table}\n"
+           f"WHERE status = 'COMPLETED' AND submitted_ts > TIMESTAMP '{since.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}'\n"
+           "  AND (UPPER(LTRIM(query)) LIKE 'CREATE%' OR UPPER(LTRIM(query)) LIKE 'ALTER%'"
+           " OR UPPER(LTRIM(query)) LIKE 'DROP%')\n"
+           "ORDER BY submitted_ts")
+    changes = []
+    for row in sql_client.submit_sql_query(sql).iter_rows():
+        change = parse_ddl_change(row['query'])
+        if change is not None:
+            changes.append(change)
+    logger.info(f"Found {len(changes)} catalog changes in the jobs history since {since.isoformat()}")
+    return changes
+
+
+class CatalogChanges:
+    """
+    Result of apply_catalog_changes: IDs of the re-collected datasets and views whose lineage was refreshed, and the
+    entities that no longer exist
+    """
+
+    def __init__(self):
+        self.updated_ids = []
+        self.dependent_ids = []
+        self.removed = []
+
+    def __len__(self):
+        return len(self.updated_ids) + len(self.dependent_ids) + len(self.removed)
+
+
+def apply_catalog_changes(api: dremio_api.DremioAPI, catalog_store: CatalogStore, changes: list[tuple], selector: CatalogSelector, max_workers=1) -> CatalogChanges:
+    """
+    Re-collect the changed datasets and patch them into the catalog of the previous export. Views that depend on a
+    removed dataset have their lineage refreshed, as a recreated parent has a new catalog ID. Dependents of datasets
+    that keep their ID are unaffected, their models reference parents by path.
+    """
+    # Spaces of an empty space selector are only selected once they are seen in the catalog root
+    root_names = {root['path'][0].lower() for root in select_catalog_roots(api.get_catalog(), selector)}
+    ids_by_path = {tuple(p.lower() for p in catalog_store.get(c).object_path): c for c in catalog_store}
+    touched = {}
+    for kind, path in changes:
+        if kind == FOLDER_DROPPED:
+            prefix = tuple(p.lower() for p in path)
+            for known_path, catalog_id in ids_by_path.items():
+                if known_path[:len(prefix)] == prefix:
+                    touched.setdefault(known_path, list(catalog_store.get(catalog_id).object_path))
+        else:
+            key = tuple(p.lower() for p in path)
+            known_id = ids_by_path.get(key)
+            touched.setdefault(key, list(catalog_store.get(known_id).object_path) if known_id else path)
+    touched = {key: path for key, path in touched.items()
+               if key[0] in root_names and selector.match(path) == SELECTED}
+
+    result = CatalogChanges()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+        collected = executor.map(lambda path: collect_changed_dataset(api, path), touched.values())
+        for key, item in zip(touched.keys(), collected):
+            previous_id = ids_by_path.get(key)
+            if item is None or (previous_id is not None and previous_id != item[0].id):
+                if previous_id is not None:
+                    result.removed.append(catalog_store.remove(previous_id))
+            if item is not None:
+                catalog_store.add(*item)
+                result.updated_ids.append(item[0].id)
+
+        removed_ids = {entity.id for entity in result.removed}
+        updated_ids = set(result.updated_ids)
+        dependents = [catalog_store.get(c) for c in catalog_store
+                      if c not in updated_ids and removed_ids.intersection(catalog_store.get(c).parent_ids)]
+        lineage = executor.map(lambda e: collect_dremio_lineage(api, e.id, e.object_path), dependents)
+        for entity, parents in zip(dependents, lineage):
+            catalog_store.set_parents(entity.id, parents)
+            result.dependent_ids.append(entity.id)
+    logger.info(f"Applied catalog changes: {len(result.updated_ids)} datasets updated, {len(result.removed)} removed, "
+                f"{len(result.dependent_ids)} dependent views refreshed")
+    return result
+
+
+def collect_changed_dataset(api: dremio_api.DremioAPI, path: list[str]) -> tuple:
+    """
+    Returns:
+        The (entity, parents) tuple of the dataset at the path with full metadata, or None if it does not exist
+    """
+    entity = api.get_catalog_by_path(path, cached=False)
+    child = dataset_child_from_entity(entity) if entity is not None else None
+    if child is None:
+        return None
+    return collect_dremio_dataset(api, child)[0][0]
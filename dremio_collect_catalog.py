@@ -1,174 +1,446 @@
 import dremio_api
+import json
 import logging
+import os
+import threading
+import time
 import urllib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dremio_catalog_store import CatalogEntity, CatalogStore, catalog_entity_from_lookup_entry, generate_versioned_lookup_entry
+from dremio_selector import NOT_SELECTED, SELECTED, CatalogSelector
 
 logger = logging.getLogger(__name__)
 
+# Seconds between progress log messages during the traversal
+PROGRESS_LOG_INTERVAL = 10
+# Seconds between flushes of the traversal checkpoint to disk
+CHECKPOINT_INTERVAL = 5
+# Seconds between checks whether the traversal was stopped, see stop_traversals
+STOP_POLL_INTERVAL = 1
 
-def get_catalog_entries(api: dremio_api.DremioAPI, space_selector=set(), source_selector=[[]]):
-    logger.info(f"Retrieving catalog from {api.dremio_url} ...")
-    catalog_root = api.get_catalog()
-    catalog_entries = collect_dremio_catalog(api, catalog_root, space_selector, source_selector)
-    return catalog_entries
+traversals_stopped = threading.Event()
 
 
-def select_source(path: list, source_selector: list[list]) -> bool:
-    for s in source_selector:
-        if s == path[:len(s)] or path == s[:len(path)]:
-            return True
-    return False
+def stop_traversals():
+    """
+    Stop the catalog traversals of all threads, keeping their checkpoints. Signals only interrupt the main thread, so
+    a multi-target export stops the traversals of its targets this way.
+    """
+    traversals_stopped.set()
 
 
-def collect_dremio_catalog(api: dremio_api.DremioAPI, catalog_root, space_selector: set, source_selector: list[list]) -> list:
-    catalog_entries = []
+class TraversalCheckpoint:
+    """
+    Append-only journal of the catalog traversal, so an interrupted traversal can be resumed. The first line holds the
+    catalog root, every further line the results and child work items of one processed work item. Lines are buffered
+    and flushed to disk every CHECKPOINT_INTERVAL seconds.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = None
+        self.flushed_at = time.monotonic()
+
+    def load(self):
+        """
+        Replay the journal of a previous traversal
+
+        Returns:
+            A tuple of the catalog root, the results of processed work items and the remaining work items, or None if
+            there is no checkpoint
+        """
+        if not os.path.exists(self.filename):
+            return None
+        catalog_root = None
+        results = {}
+        work_items = {}
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # The last line of an interrupted write is incomplete
+                    break
+                record = json.loads(line)
+                if 'catalog_root' in record:
+                    catalog_root = record['catalog_root']
+                    continue
+                results[record['id']] = [item if isinstance(item, str) else catalog_entity_from_lookup_entry(item)
+                                         for item in record['items']]
+                for child in record['children']:
+                    work_items[child['id']] = child
+        if catalog_root is None:
+            return None
+        return catalog_root, results, [item for catalog_id, item in work_items.items() if catalog_id not in results]
+
+    def start(self, catalog_root: dict):
+        self.file = open(self.filename, 'wb')
+        self.file.write(json.dumps({'catalog_root': catalog_root}).encode('utf-8') + b'\n')
+
+    def resume(self):
+        self.file = open(self.filename, 'ab')
+
+    def record(self, catalog_id: str, items: list, child_work_items: list):
+        record = {
+            'id': catalog_id,
+            'items': [item if isinstance(item, str) else generate_versioned_lookup_entry(*item) for item in items],
+            'children': child_work_items
+        }
+        self.file.write(json.dumps(record).encode('utf-8') + b'\n')
+        if time.monotonic() - self.flushed_at > CHECKPOINT_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.flushed_at = time.monotonic()
+
+    def close(self, complete=False):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+        if complete:
+            os.remove(self.filename)
+        else:
+            logger.warning(f"Catalog traversal interrupted, rerun with --resume to continue from {self.filename}")
+
+
+def get_catalog_entries(api: dremio_api.DremioAPI, selector: CatalogSelector, max_workers=1, snapshot=None, dataset_ids=None, catalog_writer=None, checkpoint: TraversalCheckpoint = None, resume=False, catalog_root=None, deferred_lineage_ids=None) -> CatalogStore:
+    """
+    Args:
+        catalog_root: Top-level catalog listing to traverse, retrieved from the API by default. Export shards pass
+            their part of the listing.
+    """
+    state = checkpoint.load() if checkpoint and resume else None
+    if state:
+        catalog_root, results, pending_items = state
+        logger.info(f"Resuming catalog traversal from {checkpoint.filename} with {len(results)} processed "
+                    f"and {len(pending_items)} remaining work items")
+    else:
+        if resume:
+            logger.warning("No traversal checkpoint found, starting a full catalog traversal")
+        if catalog_root is None:
+            logger.info(f"Retrieving catalog from {api.dremio_url} ...")
+            catalog_root = api.get_catalog()
+        results, pending_items = None, None
+    catalog_store = collect_dremio_catalog(api, catalog_root, selector, max_workers, snapshot, dataset_ids, catalog_writer,
+                                           checkpoint, results, pending_items, deferred_lineage_ids)
+    return catalog_store
+
+
+def select_catalog_roots(catalog_root, selector: CatalogSelector) -> list[dict]:
+    work_items = []
     for entry in catalog_root['data']:
         container_type = entry.get('containerType')
         if container_type == 'SOURCE':
-            if not select_source(entry['path'], source_selector):
+            if not selector.select_source(entry['path']):
                 logger.info(f"Skipping SOURCE {entry['path']} based on source selector settings.")
             else:
-                catalog_id = entry['id']
                 logger.info(f"Traversing SOURCE {entry['path']} ...")
-                catalog_entries = collect_dremio_catalog_children(api, catalog_entries, catalog_id, data_source_path=entry['path'], source_selector=source_selector)
+                work_items.append(entry)
         elif container_type == 'SPACE':
-            catalog_id = entry['id']
-            if len(space_selector) > 0 and entry['path'][0] not in space_selector:
+            if not selector.select_space(entry['path'][0]):
                 logger.info(f"Skipping SPACE {entry['path']} based on space selector settings.")
             else:
                 logger.info(f"Traversing SPACE {entry['path']} ...")
-                catalog_entries = collect_dremio_catalog_children(api, catalog_entries, catalog_id)
+                work_items.append(entry)
         else:
             logger.error(f"Unsupported container type {container_type}")
-    return catalog_entries
+    return work_items
 
 
-def collect_dremio_catalog_children(api: dremio_api.DremioAPI, data_sources: list, catalog_id, data_source_path=None, source_selector=[[]]) -> list:
-    catalog_sub_tree = api.get_catalog(catalog_id)
-    try:
-        if catalog_sub_tree["entityType"] in ["source", "space"]:
-            catalog_sub_tree["path"] = [catalog_sub_tree["name"]]
-        data_sources.append({
-            "id": catalog_id,
-            "object_type": catalog_sub_tree["entityType"],
-            "object_path": catalog_sub_tree.get("path", []),
-            "parent": [],
-            "parent_id": "",
-            "parent_type": "",
-            "tags": [],
-            "wiki": ""
-        })
-    except KeyError:
-        logger.info(f"Skipping catalog ID {catalog_id}")
+def collect_dremio_catalog(api: dremio_api.DremioAPI, catalog_root, selector: CatalogSelector, max_workers=1, snapshot=None, dataset_ids=None, catalog_writer=None, checkpoint: TraversalCheckpoint = None, results=None, pending_items=None, deferred_lineage_ids=None) -> CatalogStore:
+    """
+    Traverse the selected sources and spaces with a work queue
+
+    Args:
+        dataset_ids: Optional set of exported dataset IDs, see collect_dremio_dataset, or a Future of it. Until the
+            Future completes, containers are traversed and dataset work items are held back.
+        results: Results of already processed work items when resuming from a checkpoint
+        pending_items: Remaining work items when resuming from a checkpoint, by default the selected catalog roots
+    """
+    # Work items are catalog children. Each processed item stores its results under its catalog ID: a list of
+    # (entity, parents) tuples, where string items reference the results of a child container or dataset.
+    work_items = select_catalog_roots(catalog_root, selector)
+    if results is None:
+        results = {}
+        pending_items = work_items
+        if checkpoint:
+            checkpoint.start(catalog_root)
+    else:
+        # Roots are only journaled as part of the catalog root, so roots that had not finished are submitted again
+        pending_items = [item for item in work_items if item['id'] not in results] + pending_items
+        if checkpoint:
+            checkpoint.resume()
+        if catalog_writer:
+            for items in results.values():
+                for item in items:
+                    if not isinstance(item, str):
+                        catalog_writer.write(*item)
+
+    progress_logged_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+        pending = {}
+        # Dataset work items waiting for the export plan
+        held_items = []
+
+        def submit(item: dict):
+            if item['type'] == 'DATASET' and isinstance(dataset_ids, Future):
+                if not dataset_ids.done():
+                    held_items.append(item)
+                    return
+                planned_ids = dataset_ids.result()
+            else:
+                planned_ids = dataset_ids
+            future = submit_catalog_work_item(executor, api, item, selector, snapshot, planned_ids, deferred_lineage_ids)
+            pending[future] = item
+
+        try:
+            for item in pending_items:
+                submit(item)
+            while pending or held_items:
+                done, _ = wait(list(pending) + ([dataset_ids] if held_items else []), timeout=STOP_POLL_INTERVAL,
+                               return_when=FIRST_COMPLETED)
+                if traversals_stopped.is_set():
+                    raise Exception("Catalog traversal stopped")
+                if held_items and dataset_ids.done():
+                    logger.info(f"Export plan complete, collecting {len(held_items)} held back datasets")
+                    items, held_items = held_items, []
+                    for item in items:
+                        submit(item)
+                for future in done:
+                    if future is dataset_ids:
+                        continue
+                    child = pending.pop(future)
+                    items, child_work_items = future.result()
+                    results[child['id']] = items
+                    if child['type'] == 'DATASET':
+                        api.profile.increment('datasets_visited')
+                    else:
+                        api.profile.increment('catalog_pages_visited' if 'page_token' in child else 'containers_visited')
+                    if catalog_writer:
+                        for item in items:
+                            if not isinstance(item, str):
+                                catalog_writer.write(*item)
+                        catalog_writer.flush()
+                    if checkpoint:
+                        checkpoint.record(child['id'], items, child_work_items)
+                    for item in child_work_items:
+                        submit(item)
+                api.profile.set('work_items_remaining', len(pending))
+                if time.monotonic() - progress_logged_at > PROGRESS_LOG_INTERVAL:
+                    progress_logged_at = time.monotonic()
+                    counters = api.profile.counters
+                    logger.info(f"Visited {counters.get('containers_visited', 0)} containers and "
+                                f"{counters.get('datasets_visited', 0)} datasets, {len(pending)} work items remaining")
+        except BaseException:
+            # Do not wait for queued requests, everything processed so far is in the checkpoint
+            for future in pending:
+                future.cancel()
+            if checkpoint:
+                checkpoint.close()
+            raise
+    if checkpoint:
+        checkpoint.close(complete=True)
+
+    # Flatten in depth-first order, so the output does not depend on the completion order of the requests
+    catalog_store = CatalogStore()
+    for item in work_items:
+        for entity, parents in flatten_catalog_results(results, item['id']):
+            catalog_store.add(entity, parents)
+    return catalog_store
+
+
+def submit_catalog_work_item(executor: ThreadPoolExecutor, api: dremio_api.DremioAPI, child: dict, selector: CatalogSelector, snapshot=None, dataset_ids=None, deferred_lineage_ids=None) -> Future:
+    if child['type'] == 'DATASET':
+        return executor.submit(collect_dremio_dataset, api, child, snapshot, dataset_ids, deferred_lineage_ids)
+    if 'page_token' in child:
+        return executor.submit(collect_dremio_catalog_children, api, child['catalog_id'], selector, child['page_token'],
+                               child['page'])
+    return executor.submit(collect_dremio_catalog_children, api, child['id'], selector)
+
+
+def flatten_catalog_results(results: dict, catalog_id: str):
+    for item in results[catalog_id]:
+        if isinstance(item, str):
+            yield from flatten_catalog_results(results, item)
+        else:
+            yield item
+
+
+def collect_dremio_catalog_children(api: dremio_api.DremioAPI, catalog_id, selector: CatalogSelector, page_token=None, page=0) -> tuple[list, list]:
+    """
+    Retrieve one page of a container and return the container entity (on the first page) together with the work items
+    of its children. If more pages follow, the next page is returned as a work item of its own, so the children of
+    this page are processed while the listing continues.
+
+    Returns:
+        A tuple of the container results (entities and child catalog IDs in catalog order) and the child work items
+    """
+    items = []
+    child_work_items = []
+    catalog_sub_tree = api.get_catalog_page(catalog_id, page_token)
+    if page_token is None:
+        try:
+            if catalog_sub_tree["entityType"] in ["source", "space"]:
+                catalog_sub_tree["path"] = [catalog_sub_tree["name"]]
+            entity = CatalogEntity(catalog_id, catalog_sub_tree["entityType"], catalog_sub_tree.get("path", []),
+                                   tag=catalog_sub_tree.get("tag", ""))
+            items.append((entity, []))
+        except KeyError:
+            logger.info(f"Skipping catalog ID {catalog_id}")
     for child in catalog_sub_tree.get('children', []):
         container_type = child.get('containerType')
         dataset_type = child.get('datasetType')
-        catalog_id = child['id']
         if child['type'] == 'CONTAINER' and container_type == 'FOLDER':
-            if not select_source(child['path'], source_selector):
+            if selector.match(child['path']) == NOT_SELECTED:
                 logger.info(f"Skipping FOLDER {child['path']} based on source selector settings.") # TODO: set to debug level
             else:
                 logger.info(f"Traversing FOLDER {child['path']} ...")
-                data_sources = collect_dremio_catalog_children(api, data_sources, catalog_id, data_source_path, source_selector)
-        elif child['type'] == 'DATASET' and dataset_type == 'PROMOTED':
-            type_name = 'PDS'
-            tags = api.get_catalog_tags(catalog_id)
-            wiki = api.get_catalog_wiki(catalog_id)
-            data_sources.append({
-                "id": catalog_id,
-                "object_type": type_name,
-                "object_path": child['path'],
-                "parent": data_source_path,
-                "parent_id": "",
-                "parent_type": "SOURCE",
-                "tags": tags,
-                "wiki": wiki
-            })
-        elif child['type'] == 'DATASET' and dataset_type == 'VIRTUAL':
-            type_name = 'VDS'
-            tags = api.get_catalog_tags(catalog_id)
-            wiki = api.get_catalog_wiki(catalog_id)
-            vds_graph = api.get_catalog(catalog_id=f"{catalog_id}/graph")
-            try:
-                parents = vds_graph['parents']
-                if len(parents) == 0:
-                    logger.debug(f"No parent objects for view {child['path']} could be found (likely due to RBAC)")
-                    data_sources.append({
-                        "id": catalog_id,
-                        "object_type": type_name, 
-                        "object_path": child['path'],
-                        "parent": [],
-                        "parent_id": "",
-                        "parent_type": "",
-                        "tags": tags,
-                        "wiki": wiki
-                    })
-                    
-                for parent in parents:
-                    data_sources.append({
-                        "id": catalog_id,
-                        "object_type": type_name, 
-                        "object_path": child['path'],
-                        "parent": parent['path'],
-                        "parent_id": parent['id'],
-                        "parent_type": parent['datasetType'],
-                        "tags": tags,
-                        "wiki": wiki
-                    })
-            except KeyError as e:
-                logger.error(f"Data lineage for view {child['path']} could not be retrieved")
-                data_sources.append({
-                    "id": catalog_id,
-                    "object_type": type_name, 
-                    "object_path": child['path'],
-                    "parent": [],
-                    "parent_id": "",
-                    "parent_type": "",
-                    "tags": tags,
-                    "wiki": wiki
-                })
-
-            # # Add column entries
-            # vds_definition = api.get_catalog(vds_id)
-            # type_name = 'VDS_column'
-            # relationship_table = qualified_name
-            # for col in vds_definition['fields']:
-            #     name = col['name']
-            #     qualified_name = f"{relationship_table}#{name}"
-            #     data_type = col['type']['name']
-            #     data_sources.append({
-            #         "object_type": type_name, 
-            #         "object_path": name, 
-            #         "fully_qualified_name": qualified_name, 
-            #         "parent": relationship_table, 
-            #         "type": data_type
-            #     })
-
+                items.append(child['id'])
+                child_work_items.append(child)
+        elif child['type'] == 'DATASET' and dataset_type in ['PROMOTED', 'VIRTUAL']:
+            if selector.is_excluded(child['path']):
+                logger.debug(f"Skipping DATASET {child['path']} based on exclude selector settings.")
+                continue
+            items.append(child['id'])
+            child_work_items.append(child)
         elif child['type'] == 'FILE':
             logger.debug(f"Skipping unpromoted file {child['path']}")
         else:
             logger.warning(f"Unsupported container {container_type} or dataset {dataset_type}")
             print(child)
-    return data_sources
+    next_page_token = catalog_sub_tree.get('nextPageToken')
+    if next_page_token:
+        # The results of the next page are referenced after the children of this page, so the catalog order is kept.
+        # It is submitted first, so the listing is not queued behind the children.
+        next_page = {'id': f"{catalog_id}#page{page + 1}", 'type': 'CONTAINER', 'catalog_id': catalog_id,
+                     'page': page + 1, 'page_token': next_page_token}
+        items.append(next_page['id'])
+        child_work_items.insert(0, next_page)
+    return items, child_work_items
 
 
-def generate_catalog_lookup(catalog_entries: list[dict]):
-    catalog_lookup = {}
-    for entry in catalog_entries:
-        catalog_id = entry['id']
-        parent_entry = {
-            "id": entry['parent_id'],
-            "name": entry['parent'],
-            "type": entry['parent_type']
-        }
-        if catalog_id in catalog_lookup:
-            catalog_lookup[catalog_id]['parents'].append(parent_entry)
+def collect_dremio_dataset(api: dremio_api.DremioAPI, child: dict, snapshot=None, dataset_ids=None, deferred_lineage_ids=None) -> tuple[list, list]:
+    """
+    Build the catalog entity of a dataset including its tags, wiki and (for views) parent datasets
+
+    Args:
+        dataset_ids: Optional set of dataset IDs that will be exported. Other datasets are only needed to resolve
+            parent references, so their entities are built from the container listing without further requests.
+        deferred_lineage_ids: Optional set of view IDs whose parents are resolved after the traversal, see
+            dremio_sql_lineage. Their entities are added without parents.
+    """
+    catalog_id = child['id']
+    type_name = 'PDS' if child['datasetType'] == 'PROMOTED' else 'VDS'
+    if dataset_ids is not None and catalog_id not in dataset_ids:
+        logger.debug(f"Skipping metadata of dataset {child['path']}, as it is not exported")
+        # No version tag is recorded, so the incomplete entity is never reused from a catalog snapshot
+        return [(CatalogEntity(catalog_id, type_name, child['path']), [])], []
+    version = child.get('tag', '')
+    if snapshot and version and snapshot.get(catalog_id, {}).get('tag') == version:
+        logger.debug(f"Reusing unchanged dataset {child['path']} from catalog snapshot")
+        return [catalog_entity_from_lookup_entry(snapshot[catalog_id])], []
+
+    tags = api.get_catalog_tags(catalog_id)
+    wiki = api.get_catalog_wiki(catalog_id)
+    parents = []
+    if type_name == 'VDS' and (deferred_lineage_ids is None or catalog_id not in deferred_lineage_ids):
+        parents = collect_dremio_lineage(api, catalog_id, child['path'])
+
+        # # Add column entries
+        # vds_definition = api.get_catalog(vds_id)
+        # type_name = 'VDS_column'
+        # relationship_table = qualified_name
+        # for col in vds_definition['fields']:
+        #     name = col['name']
+        #     qualified_name = f"{relationship_table}#{name}"
+        #     data_type = col['type']['name']
+        #     data_sources.append({
+        #         "object_type": type_name, 
+        #         "object_path": name, 
+        #         "fully_qualified_name": qualified_name, 
+        #         "parent": relationship_table, 
+        #         "type": data_type
+        #     })
+
+    entity = CatalogEntity(catalog_id, type_name, child['path'], [p[0] for p in parents], tags, wiki, version)
+    return [(entity, parents)], []
+
+
+def dataset_child_from_entity(entity: dict) -> dict:
+    """
+    Convert a dataset entity of the catalog API into the format of a container child, as accepted by
+    collect_dremio_dataset
+
+    Returns:
+        The child, or None if the entity is not a dataset
+    """
+    if entity.get('type') not in ['VIRTUAL_DATASET', 'PHYSICAL_DATASET']:
+        return None
+    dataset_type = 'VIRTUAL' if entity['type'] == 'VIRTUAL_DATASET' else 'PROMOTED'
+    return {'id': entity['id'], 'path': entity['path'], 'type': 'DATASET', 'datasetType': dataset_type,
+            'tag': entity.get('tag', '')}
+
+
+def collect_dremio_lineage(api: dremio_api.DremioAPI, catalog_id: str, path) -> list[tuple]:
+    """
+    Returns:
+        The (id, path, dataset type) tuples of the direct parents of a view from the /graph endpoint
+    """
+    vds_graph = api.get_catalog(catalog_id=f"{catalog_id}/graph")
+    try:
+        parents = [(parent['id'], parent['path'], parent['datasetType']) for parent in vds_graph['parents']]
+        if len(parents) == 0:
+            logger.debug(f"No parent objects for view {path} could be found (likely due to RBAC)")
+    except KeyError as e:
+        logger.error(f"Data lineage for view {path} could not be retrieved")
+        parents = []
+    return parents
+
+
+def refresh_reused_lineage(api: dremio_api.DremioAPI, catalog_store: CatalogStore, snapshot: dict, selector: CatalogSelector, max_workers=1) -> int:
+    """
+    Views reused from a catalog snapshot keep the parent IDs of the previous run. Dropping and recreating a parent
+    gives it a new ID under the same path without changing the version of its children. Missing parents within the
+    traversed scope are therefore re-mapped by path, and views whose parent no longer exists get their lineage from
+    the /graph endpoint again.
+
+    Returns:
+        The number of views whose parents were updated
+    """
+    if not snapshot:
+        return 0
+    ids_by_path = {catalog_store.get(c).object_path: c for c in catalog_store}
+    remapped = {}
+    stale = []
+    for catalog_id in catalog_store:
+        entity = catalog_store.get(catalog_id)
+        if entity.object_type != 'VDS' or not entity.tag or snapshot.get(catalog_id, {}).get('tag') != entity.tag:
+            continue
+        parents = []
+        for parent_id, parent_path, parent_type in catalog_store.get_parent_tuples(entity):
+            if parent_id in catalog_store or selector.match(parent_path) != SELECTED:
+                # Parents outside the traversed scope cannot be checked
+                parents.append((parent_id, parent_path, parent_type))
+                continue
+            new_id = ids_by_path.get(tuple(parent_path))
+            if new_id is None:
+                stale.append(entity)
+                break
+            new_type = 'VIRTUAL' if catalog_store.get(new_id).object_type == 'VDS' else 'PROMOTED'
+            parents.append((new_id, parent_path, new_type))
         else:
-            catalog_lookup[catalog_id] = {
-                "id": catalog_id,
-                "object_path": entry['object_path'],
-                "object_type": entry['object_type'],
-                "parents": [parent_entry],
-                "tags": entry['tags'],
-                "wiki": entry['wiki']
-            }
-    return catalog_lookup
+            if [p[0] for p in parents] != list(entity.parent_ids):
+                remapped[catalog_id] = parents
+
+    for catalog_id, parents in remapped.items():
+        logger.info(f"Re-mapping recreated parents of view {catalog_store.get(catalog_id).object_path}")
+        catalog_store.set_parents(catalog_id, parents)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+        lineage = executor.map(lambda e: collect_dremio_lineage(api, e.id, e.object_path), stale)
+        for entity, parents in zip(stale, lineage):
+            logger.info(f"Refreshing the lineage of view {entity.object_path}, a parent no longer exists")
+            catalog_store.set_parents(entity.id, parents)
+    api.profile.increment('reused_lineage_refreshed', len(remapped) + len(stale))
+    return len(remapped) + len(stale)
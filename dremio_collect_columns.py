@@ -0,0 +1,69 @@
+import dremio_api
+import logging
+from dremio_selector import CatalogSelector
+
+logger = logging.getLogger(__name__)
+
+COLUMNS_QUERY = ('SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, DATA_TYPE, NUMERIC_PRECISION, '
+                 'NUMERIC_SCALE FROM INFORMATION_SCHEMA."COLUMNS" ')
+
+# Names of the SQL types that differ from their INFORMATION_SCHEMA DATA_TYPE
+DATA_TYPE_NAMES = {
+    "CHARACTER VARYING": "VARCHAR",
+    "BINARY VARYING": "VARBINARY",
+}
+
+
+def submit_columns_query(api: dremio_api.DremioAPI, sql_client, selector: CatalogSelector):
+    """
+    Submit one query for the columns of all datasets in the selected spaces and source paths. The query runs on
+    Dremio while the catalog is traversed, its results are paged like any other system table query.
+    """
+    space_names = []
+    if selector.all_spaces:
+        space_names = [entry['path'][0] for entry in api.get_catalog()['data'] if entry.get('containerType') == 'SPACE']
+    return sql_client.submit_sql_query(COLUMNS_QUERY + selector.build_information_schema_filter(space_names))
+
+
+def submit_dataset_columns_query(sql_client, dataset_paths):
+    """
+    Submit a query for the columns of the given datasets, e.g. of a lineage closure that is not covered by the
+    selectors
+    """
+    predicates = []
+    for path in sorted(tuple(p) for p in dataset_paths):
+        schema = ".".join(path[:-1]).replace("'", "''")
+        name = path[-1].replace("'", "''")
+        predicates.append(f"(TABLE_SCHEMA = '{schema}' AND TABLE_NAME = '{name}')")
+    where_clause = "WHERE " + "\n   OR ".join(predicates) if predicates else "WHERE FALSE"
+    return sql_client.submit_sql_query(COLUMNS_QUERY + where_clause)
+
+
+def format_data_type(row: dict) -> str:
+    data_type = DATA_TYPE_NAMES.get(row['DATA_TYPE'], row['DATA_TYPE'])
+    if data_type == "DECIMAL" and row.get('NUMERIC_PRECISION') is not None:
+        data_type += f"({row['NUMERIC_PRECISION']},{row.get('NUMERIC_SCALE') or 0})"
+    return data_type
+
+
+def collect_dataset_columns(columns_job, dataset_paths, max_workers=1) -> dict[tuple, list[tuple]]:
+    """
+    Join the rows of the columns query against the paths of the exported datasets. INFORMATION_SCHEMA names a
+    dataset by its dotted schema and table name, which are matched case-insensitively like Dremio does.
+
+    Returns:
+        The (name, data type) tuples of the columns in ordinal order by dataset path, for the datasets whose
+        columns were found
+    """
+    paths_by_name = {}
+    for path in dataset_paths:
+        paths_by_name[(".".join(path[:-1]).lower(), path[-1].lower())] = tuple(path)
+    columns = {}
+    for row in columns_job.iter_rows(max_workers):
+        path = paths_by_name.get((row['TABLE_SCHEMA'].lower(), row['TABLE_NAME'].lower()))
+        if path is not None:
+            columns.setdefault(path, []).append((int(row['ORDINAL_POSITION']), row['COLUMN_NAME'], format_data_type(row)))
+    for path, dataset_columns in columns.items():
+        columns[path] = [(name, data_type) for _, name, data_type in sorted(dataset_columns)]
+    logger.info(f"Collected the columns of {len(columns)} of {len(paths_by_name)} datasets")
+    return columns
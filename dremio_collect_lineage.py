@@ -0,0 +1,120 @@
+import dremio_api
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dremio_catalog_store import CatalogEntity, CatalogStore
+from dremio_collect_catalog import collect_dremio_dataset, dataset_child_from_entity
+
+logger = logging.getLogger(__name__)
+
+# DFS states of topological_order
+VISITING = 1
+VISITED = 2
+
+
+def collect_lineage_closure(api: dremio_api.DremioAPI, seeds: list, max_workers=1, snapshot=None, full_metadata=False) -> CatalogStore:
+    """
+    Collect the given views and their upstream lineage through the /graph endpoint, without traversing the catalog
+
+    Args:
+        seeds: View paths (lists of path components) or catalog IDs
+        full_metadata: Also retrieve tags and wikis of the PDSs in the lineage, which are not exported as models
+
+    Returns:
+        A CatalogStore in topological order, every dataset is added after the datasets it depends on
+    """
+    logger.info(f"Collecting the upstream lineage of {len(seeds)} views from {api.dremio_url} ...")
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+        seed_datasets = [d for d in executor.map(lambda seed: resolve_lineage_seed(api, seed), seeds) if d]
+        seen = set()
+        pending = {}
+        for child in seed_datasets:
+            if child['id'] not in seen:
+                seen.add(child['id'])
+                pending[executor.submit(collect_lineage_dataset, api, child, snapshot, full_metadata)] = child
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                entity, parents = future.result()
+                results[entity.id] = (entity, parents)
+                api.profile.increment('datasets_visited')
+                for parent_id, parent_path, parent_type in parents:
+                    if parent_id in seen:
+                        continue
+                    seen.add(parent_id)
+                    child = {'id': parent_id, 'path': parent_path, 'type': 'DATASET', 'datasetType': parent_type}
+                    pending[executor.submit(collect_lineage_dataset, api, child, snapshot, full_metadata)] = child
+
+    catalog_store = CatalogStore()
+    for catalog_id in topological_order(results, [d['id'] for d in seed_datasets]):
+        catalog_store.add(*results[catalog_id])
+    logger.info(f"Collected {len(catalog_store)} datasets in the lineage of {len(seed_datasets)} views")
+    return catalog_store
+
+
+def resolve_lineage_seed(api: dremio_api.DremioAPI, seed) -> dict:
+    """
+    Look up a view by path or ID and return it in the format of a catalog child
+    """
+    if isinstance(seed, str):
+        entity = api.get_catalog(seed)
+    else:
+        entity = api.get_catalog_by_path(seed)
+    if entity is None or 'id' not in entity:
+        logger.error(f"Lineage selector {seed} not found")
+        return None
+    child = dataset_child_from_entity(entity)
+    if child is None:
+        logger.error(f"Lineage selector {seed} is not a dataset")
+    return child
+
+
+def collect_lineage_dataset(api: dremio_api.DremioAPI, child: dict, snapshot=None, full_metadata=False) -> tuple:
+    if child['datasetType'] != 'VIRTUAL' and not full_metadata:
+        # Path and type from the lineage graph are all that is needed to reference a PDS
+        return CatalogEntity(child['id'], 'PDS', child['path']), []
+    return collect_dremio_dataset(api, child, snapshot)[0][0]
+
+
+def topological_order(results: dict, roots: list[str]) -> list[str]:
+    """
+    Order the collected datasets depth-first from the roots, so that parents precede the datasets depending on them.
+    Lineage cycles are logged and broken at the edge that closes them.
+    """
+    order = []
+    state = {}
+    for root in roots:
+        if root in state:
+            continue
+        state[root] = VISITING
+        stack = [(root, iter(results[root][0].parent_ids))]
+        while stack:
+            catalog_id, parent_ids = stack[-1]
+            for parent_id in parent_ids:
+                if parent_id not in results:
+                    continue
+                if state.get(parent_id) == VISITING:
+                    cycle = [c for c, _ in stack[[c for c, _ in stack].index(parent_id):]]
+                    logger.error(f"Lineage cycle detected: {' -> '.join(cycle + [parent_id])}")
+                    continue
+                if parent_id not in state:
+                    state[parent_id] = VISITING
+                    stack.append((parent_id, iter(results[parent_id][0].parent_ids)))
+                    break
+            else:
+                stack.pop()
+                state[catalog_id] = VISITED
+                order.append(catalog_id)
+    return order
+
+
+def build_sys_id_filter(column: str, catalog_ids) -> str:
+    """
+    Build a WHERE clause restricting a system table query to the given dataset IDs
+    """
+    if not catalog_ids:
+        return "WHERE FALSE"
+    ids = ", ".join("'" + catalog_id.replace("'", "''") + "'" for catalog_id in sorted(catalog_ids))
+    return f"WHERE {column} IN ({ids})"
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import dbt_export
+import dremio_api
+import dremio_collect_catalog
+from concurrent.futures import ThreadPoolExecutor
+from dbt_model_writer import ModelWriter
+from dremio_selector import CatalogSelector
+
+logging.basicConfig(stream=sys.stdout,
+                    format="%(levelname)s\t%(asctime)s - %(message)s",
+                    level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reflection settings that are compared across environments, IDs differ between environments
+REFLECTION_FIELDS = ["reflection_name", "type", "display_columns", "sort_columns", "partition_columns",
+                     "dimensions", "measures"]
+
+
+def hash_value(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class EnvironmentExport:
+    """
+    Views, reflections and catalog entities of one Dremio environment, keyed by path, with a fingerprint per path
+    """
+
+    def __init__(self, dremio_url: str, catalog_store):
+        self.dremio_url = dremio_url
+        self.catalog_store = catalog_store
+        self.entities = {}
+        self.views = {}
+        self.reflections = {}
+        self.fingerprints = {}
+
+    def add_view(self, row: dict):
+        view = self.catalog_store.get(row['view_id'])
+        if view is None:
+            logger.error(f"Lookup entry not found for {row['view_name']} {row['path']} - {row['view_id']}")
+            return
+        self.entities[view.object_path] = view
+        self.views[view.object_path] = row
+
+    def add_reflection(self, r: dict):
+        dataset = self.catalog_store.get(r['dataset_id'])
+        if dataset is None:
+            return
+        self.entities[dataset.object_path] = dataset
+        self.reflections.setdefault(dataset.object_path, []).append(r)
+
+    def fingerprint(self, path: tuple) -> tuple[str, dict]:
+        """
+        Returns:
+            A tuple of the hash over all compared fields and the hashes of the individual fields
+        """
+        if path not in self.fingerprints:
+            entity = self.entities[path]
+            row = self.views.get(path)
+            fields = {
+                "sql_definition": hash_value([row['sql_definition'], row['sql_context']]) if row else None,
+                "tags": hash_value(entity.tags),
+                "wiki": hash_value(entity.wiki),
+                "reflections": hash_value(sorted([r[f] for f in REFLECTION_FIELDS]
+                                                 for r in self.reflections.get(path, [])))
+            }
+            self.fingerprints[path] = (hash_value(fields), fields)
+        return self.fingerprints[path]
+
+
+def collect_environment(api_args: dict, export_filter: dict, max_workers=1) -> EnvironmentExport:
+    api = dremio_api.DremioAPI(**api_args)
+    selector = CatalogSelector(export_filter["space_selector"], export_filter["source_selector"],
+                               export_filter.get("exclude_selector", []))
+    views_job = api.submit_sql_query('SELECT * FROM sys.views ' + selector.build_sys_views_filter())
+    reflections_job = api.submit_sql_query('SELECT * FROM sys.reflections ' + selector.build_sys_reflections_filter())
+    view_rows = list(views_job.iter_rows(max_workers))
+    reflections = reflections_job.get_data()
+    dataset_ids = dbt_export.plan_export_dataset_ids(view_rows, reflections)
+    catalog_store = dremio_collect_catalog.get_catalog_entries(api, selector, max_workers, dataset_ids=dataset_ids)
+
+    environment = EnvironmentExport(api.dremio_url, catalog_store)
+    for row in view_rows:
+        environment.add_view(row)
+    for r in reflections['rows']:
+        environment.add_reflection(r)
+    return environment
+
+
+def diff_environments(dev: EnvironmentExport, prod: EnvironmentExport) -> dict:
+    """
+    Compare two environments by path. Entities with equal fingerprints are skipped without comparing their fields.
+
+    Returns:
+        A changeset with the added, changed and removed entities of dev relative to prod
+    """
+    changeset = {"dev": dev.dremio_url, "prod": prod.dremio_url, "added": [], "changed": [], "removed": [],
+                 "unchanged": 0}
+    for path in sorted(dev.entities.keys() | prod.entities.keys()):
+        if path not in prod.entities:
+            changeset["added"].append({"path": list(path), "object_type": dev.entities[path].object_type})
+        elif path not in dev.entities:
+            changeset["removed"].append({"path": list(path), "object_type": prod.entities[path].object_type})
+        else:
+            dev_hash, dev_fields = dev.fingerprint(path)
+            prod_hash, prod_fields = prod.fingerprint(path)
+            if dev_hash == prod_hash:
+                changeset["unchanged"] += 1
+                continue
+            changeset["changed"].append({
+                "path": list(path),
+                "object_type": dev.entities[path].object_type,
+                "fields": [f for f in dev_fields if dev_fields[f] != prod_fields[f]]
+            })
+    return changeset
+
+
+def write_changed_models(dev: EnvironmentExport, changeset: dict, output_dir: str) -> dict:
+    """
+    Write the dev models of added and changed entities, removed entities are only listed in the changeset
+    """
+    model_writer = ModelWriter(os.path.join(output_dir, "models"))
+    pdss = {}
+    for change in changeset["added"] + changeset["changed"]:
+        path = tuple(change["path"])
+        if path in dev.views:
+            pds_paths = dbt_export.write_view_model(dev.views[path], dev.catalog_store, output_dir, model_writer)
+            pdss.update(dict.fromkeys(tuple(pds) for pds in pds_paths))
+        for r in dev.reflections.get(path, []):
+            dbt_export.write_reflection_model(r, dev.catalog_store, output_dir, model_writer)
+    dbt_export.write_pds_refresh_macro(pdss, output_dir)
+    return model_writer.close()
+
+
+def parse_cli_args():
+    parser = argparse.ArgumentParser(description='Diff the views and reflections of two Dremio environments')
+    parser.add_argument('--export-filter-json', type=str,
+                        help='Absolute path to export_filter.json file, applied to both environments.',
+                        required=True)
+    parser.add_argument('--dev-endpoint', type=str, help='Dremio URL of the environment to promote from', required=True)
+    parser.add_argument('--dev-pat', type=str, help='Dremio PAT of the dev environment', required=True)
+    parser.add_argument('--prod-endpoint', type=str, help='Dremio URL of the environment to compare against', required=True)
+    parser.add_argument('--prod-pat', type=str, help='Dremio PAT of the prod environment', required=True)
+    parser.add_argument('--output-dir', type=str, help='Output directory of the changed dbt models and the changeset',
+                        required=True)
+    parser.add_argument('--max-workers', type=int, default=1,
+                        help='Number of concurrent catalog requests per environment (default: 1)', required=False)
+    dremio_api.add_api_arguments(parser)
+    cli_args = parser.parse_args()
+    return cli_args
+
+if __name__ == '__main__':
+
+    args = parse_cli_args()
+    with open(args.export_filter_json, 'r') as f:
+        export_filter = json.load(f)
+
+    environments = {}
+    for name, endpoint, pat in [('dev', args.dev_endpoint, args.dev_pat), ('prod', args.prod_endpoint, args.prod_pat)]:
+        environments[name] = dremio_api.build_api_args(args, endpoint, pat)
+
+    # Both environments are crawled at the same time, each with its own API client and connection pool
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {name: executor.submit(collect_environment, api_args, export_filter, args.max_workers)
+                   for name, api_args in environments.items()}
+        dev, prod = futures['dev'].result(), futures['prod'].result()
+
+    changeset = diff_environments(dev, prod)
+    write_changed_models(dev, changeset, args.output_dir)
+
+    changeset_filename = os.path.join(args.output_dir, 'dremio_changeset.json')
+    with open(changeset_filename, 'w') as f:
+        json.dump(changeset, f, indent=2)
+    logger.info(f"Created {changeset_filename}: {len(changeset['added'])} added, {len(changeset['changed'])} changed, "
+                f"{len(changeset['removed'])} removed, {changeset['unchanged']} unchanged")
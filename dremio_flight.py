@@ -0,0 +1,79 @@
+import logging
+import time
+from dremio_profile import RunProfile
+
+try:
+    from pyarrow import flight
+except ImportError:
+    # Arrow Flight is optional, the REST API is used without it
+    flight = None
+
+logger = logging.getLogger(__name__)
+
+
+class DremioFlightClient:
+    """
+    Arrow Flight client for bulk queries such as the system table queries. Results are streamed as Arrow record
+    batches instead of paged JSON. Requires pyarrow.
+    """
+
+    def __init__(self, location: str, dremio_pat: str, verify=False, profile: RunProfile = None):
+        if flight is None:
+            raise ImportError("Arrow Flight requires pyarrow, please install it with: pip install pyarrow")
+        self.location = location
+        kwargs = {}
+        if location.startswith("grpc+tls"):
+            kwargs["disable_server_verification"] = not verify
+        self.client = flight.FlightClient(location, **kwargs)
+        self.options = flight.FlightCallOptions(headers=[(b"authorization", f"Bearer {dremio_pat}".encode("utf-8"))])
+        self.profile = profile or RunProfile()
+
+    def submit_sql_query(self, sql: str) -> "FlightQuery":
+        """
+        Plan a query on Dremio and return a handle to stream its results
+        """
+        logger.info(sql)
+        start = time.perf_counter()
+        try:
+            info = self.client.get_flight_info(flight.FlightDescriptor.for_command(sql), self.options)
+        except flight.FlightError:
+            self.profile.record_request('flight_info', time.perf_counter() - start, 0, error=True)
+            raise
+        self.profile.record_request('flight_info', time.perf_counter() - start, 0)
+        return FlightQuery(self, info)
+
+    def iter_batches(self, info):
+        for endpoint in info.endpoints:
+            start = time.perf_counter()
+            reader = self.client.do_get(endpoint.ticket, self.options)
+            for chunk in reader:
+                self.profile.record_request('flight_batch', time.perf_counter() - start, chunk.data.nbytes)
+                yield chunk.data
+                start = time.perf_counter()
+
+
+class FlightQuery:
+    """
+    Handle for a query submitted over Arrow Flight, with the row interface of DremioJob
+    """
+
+    def __init__(self, client: DremioFlightClient, info):
+        self.client = client
+        self.info = info
+        self.data = None
+
+    def get_data(self) -> dict:
+        if self.data is None:
+            rows = list(self.iter_rows())
+            self.data = {"rowCount": len(rows), "rows": rows}
+        return self.data
+
+    def iter_rows(self, max_workers=1):
+        """
+        Yield the result rows as dicts. The results are a single stream, so max_workers is ignored.
+        """
+        if self.data is not None:
+            yield from self.data["rows"]
+            return
+        for batch in self.client.iter_batches(self.info):
+            yield from batch.to_pylist()
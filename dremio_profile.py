@@ -0,0 +1,125 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf")]
+
+
+class EndpointStats:
+    """
+    Request count, received bytes and latency histogram of a single endpoint class
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def record(self, latency: float, bytes_received: int, error=False):
+        self.requests += 1
+        self.errors += int(error)
+        self.bytes_received += bytes_received
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def merge(self, other: "EndpointStats"):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.retries += other.retries
+        self.bytes_received += other.bytes_received
+        self.total_latency += other.total_latency
+        self.max_latency = max(self.max_latency, other.max_latency)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_received": self.bytes_received,
+            "total_latency_s": round(self.total_latency, 3),
+            "mean_latency_s": round(self.total_latency / self.requests, 4) if self.requests else 0.0,
+            "max_latency_s": round(self.max_latency, 4),
+            "latency_histogram": {
+                ("+Inf" if bound == float("inf") else f"<={bound}s"): count
+                for bound, count in zip(LATENCY_BUCKETS, self.histogram)
+            }
+        }
+
+
+class RunProfile:
+    """
+    Thread-safe collection of per-endpoint request statistics, phase timings and progress counters of an export run
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.phases = {}
+        self.phase_started_at = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started_at = time.perf_counter()
+
+    def record_request(self, endpoint: str, latency: float, bytes_received: int, error=False):
+        with self.lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).record(latency, bytes_received, error)
+
+    def record_retry(self, endpoint: str):
+        with self.lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).retries += 1
+
+    def increment(self, counter: str, value=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set(self, counter: str, value):
+        with self.lock:
+            self.counters[counter] = value
+
+    def merge(self, endpoints: dict, counters: dict):
+        """
+        Add the endpoint statistics and counters collected by another process, e.g. an export shard
+        """
+        with self.lock:
+            for name, stats in endpoints.items():
+                self.endpoints.setdefault(name, EndpointStats()).merge(stats)
+            for counter, value in counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def start_phase(self, name: str):
+        with self.lock:
+            self.phase_started_at[name] = time.perf_counter()
+
+    def end_phase(self, name: str):
+        with self.lock:
+            duration = time.perf_counter() - self.phase_started_at.pop(name)
+            self.phases[name] = round(self.phases.get(name, 0.0) + duration, 3)
+        logger.debug(f"Phase {name} took {duration:.1f}s")
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start_phase(name)
+        try:
+            yield
+        finally:
+            self.end_phase(name)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "wall_time_s": round(time.perf_counter() - self.started_at, 3),
+                "phases_s": dict(self.phases),
+                "counters": dict(self.counters),
+                "requests": sum(e.requests for e in self.endpoints.values()),
+                "endpoints": {name: stats.to_dict() for name, stats in sorted(self.endpoints.items())}
+            }
@@ -0,0 +1,160 @@
+# Results of CatalogSelector.match
+NOT_SELECTED = 0
+TRAVERSE = 1  # The path is an ancestor of a selected path, so it must be traversed to reach it
+SELECTED = 2
+
+
+class SelectorNode:
+    __slots__ = ("children", "selected", "excluded")
+
+    def __init__(self):
+        self.children = {}
+        self.selected = False
+        self.excluded = False
+
+
+class CatalogSelector:
+    """
+    Compiled export filter: a trie over catalog path components holding the selected spaces, the selected source
+    paths and excluded paths. Matching a path takes one dict lookup per path component.
+    """
+
+    def __init__(self, space_selector=(), source_selector=(), exclude_selector=()):
+        self.root = SelectorNode()
+        self.space_names = set(space_selector)
+        # An empty space selector selects all spaces
+        self.all_spaces = len(self.space_names) == 0
+        for space in self.space_names:
+            self.add([space])
+        for path in source_selector:
+            self.add(path)
+        for path in exclude_selector:
+            self.add(path, excluded=True)
+
+    def add(self, path: list, excluded=False):
+        node = self.root
+        for component in path:
+            node = node.children.setdefault(component, SelectorNode())
+        if excluded:
+            node.excluded = True
+        else:
+            node.selected = True
+
+    def match(self, path) -> int:
+        node = self.root
+        selected = node.selected
+        for component in path:
+            if node.excluded:
+                return NOT_SELECTED
+            node = node.children.get(component)
+            if node is None:
+                return SELECTED if selected else NOT_SELECTED
+            selected = selected or node.selected
+        if node.excluded:
+            return NOT_SELECTED
+        return SELECTED if selected else TRAVERSE
+
+    def is_excluded(self, path) -> bool:
+        node = self.root
+        for component in path:
+            if node.excluded:
+                return True
+            node = node.children.get(component)
+            if node is None:
+                return False
+        return node.excluded
+
+    def select_space(self, name: str) -> bool:
+        if self.is_excluded([name]):
+            return False
+        if self.all_spaces:
+            # Resolve the implicit selection, so that folders below the space match as well
+            self.add([name])
+        return self.all_spaces or name in self.space_names
+
+    def select_source(self, path: list) -> bool:
+        return path[0] not in self.space_names and self.match(path) != NOT_SELECTED
+
+    def iter_paths(self, excluded=False, node=None, path=()):
+        """
+        Yield the minimal set of selected (or excluded) path prefixes, skipping paths below an already yielded prefix
+        """
+        node = node or self.root
+        if (node.excluded if excluded else node.selected) and len(path) > 0:
+            yield list(path)
+            return
+        for component, child in node.children.items():
+            yield from self.iter_paths(excluded, child, path + (component,))
+
+    def build_sys_views_filter(self) -> str:
+        """
+        Build the WHERE clause for sys.views. Views are selected by their space, the path column has the
+        format [space, folder, ..., view].
+        """
+        include = [] if self.all_spaces else [build_path_predicate([s]) for s in sorted(self.space_names)]
+        exclude = [build_path_predicate(p) for p in self.iter_paths(excluded=True)]
+        return build_where_clause(include, exclude)
+
+    def build_sys_reflections_filter(self) -> str:
+        """
+        Build the WHERE clause for sys.reflections. The dotted dataset_name can only be matched exactly on its first
+        component, deeper selectors are enforced by the catalog lookup.
+        """
+        include = []
+        if not self.all_spaces:
+            for space in sorted(self.space_names):
+                name = escape_like(space)
+                include.append(f"dataset_name LIKE '{name}.%' ESCAPE '\\' OR dataset_name LIKE '\"{name}\".%' ESCAPE '\\'")
+        return build_where_clause(include, [])
+
+    def build_information_schema_filter(self, space_names=()) -> str:
+        """
+        Build the WHERE clause for INFORMATION_SCHEMA tables. Datasets are selected by their dotted TABLE_SCHEMA,
+        the spaces of an empty space selector have to be passed in.
+        """
+        paths = {tuple(p) for p in self.iter_paths()}
+        if self.all_spaces:
+            paths.update((space,) for space in space_names)
+        if not paths:
+            # Nothing is selected, an empty include list would match every source of the cluster
+            return "WHERE FALSE"
+        include = [build_schema_predicate(list(p)) for p in sorted(paths)]
+        exclude = [build_schema_predicate(p) for p in self.iter_paths(excluded=True)]
+        return build_where_clause(include, exclude)
+
+
+def escape_like(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("'", "''")
+
+
+def build_path_predicate(path: list) -> str:
+    """
+    Match the path itself as well as everything below it
+    """
+    exact = ", ".join(path).replace("'", "''")
+    prefix = escape_like(", ".join(path))
+    return f"path = '[{exact}]' OR path LIKE '[{prefix}, %' ESCAPE '\\'"
+
+
+def build_schema_predicate(path: list) -> str:
+    """
+    Match the datasets below the path, and the dataset at the path itself
+    """
+    schema = ".".join(path).replace("'", "''")
+    predicate = f"TABLE_SCHEMA = '{schema}' OR TABLE_SCHEMA LIKE '{escape_like('.'.join(path))}.%' ESCAPE '\\'"
+    if len(path) > 1:
+        parent = ".".join(path[:-1]).replace("'", "''")
+        name = path[-1].replace("'", "''")
+        predicate += f" OR (TABLE_SCHEMA = '{parent}' AND TABLE_NAME = '{name}')"
+    return predicate
+
+
+def build_where_clause(include: list[str], exclude: list[str]) -> str:
+    clauses = []
+    if include:
+        clauses.append("(" + "\n   OR ".join(include) + ")")
+    if exclude:
+        clauses.append("NOT (" + "\n   OR ".join(exclude) + ")")
+    if not clauses:
+        return ""
+    return "WHERE " + "\n  AND ".join(clauses)
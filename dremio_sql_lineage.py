@@ -0,0 +1,280 @@
+import dremio_api
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dremio_catalog_store import CatalogStore
+from dremio_collect_catalog import collect_dremio_lineage
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"""
+      (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<quoted>"(?:[^"]|"")*")
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+    | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<op>.)
+""", re.S | re.X)
+
+# Keywords that end the comma-separated list of a FROM clause
+FROM_LIST_END_KEYWORDS = {"SELECT", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "FETCH", "UNION", "EXCEPT",
+                          "INTERSECT", "MINUS", "WINDOW", "QUALIFY"}
+
+# FROM items that reference no dataset by name, their parents are left to the /graph endpoint
+UNSUPPORTED_FROM_KEYWORDS = {"LATERAL", "UNNEST", "TABLE"}
+
+DATASET_TYPES = {"VDS": "VIRTUAL", "PDS": "PROMOTED"}
+
+
+def tokenize(sql: str) -> list[tuple]:
+    """
+    Split SQL into (kind, text) tokens without whitespace and comments. Quoted identifiers are unescaped.
+
+    Returns:
+        The tokens, or None if the SQL contains an unterminated string or quoted identifier
+
+    Examples:
+        >>> tokenize('SELECT "a ""b"" c" /* comment */ FROM t')
+        [('ident', 'SELECT'), ('quoted', 'a "b" c'), ('ident', 'FROM'), ('ident', 't')]
+        >>> tokenize("SELECT 'unterminated") is None
+        True
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ("space", "comment"):
+            continue
+        if kind == "op" and text in ("'", '"'):
+            return None
+        if kind == "quoted":
+            text = text[1:-1].replace('""', '"')
+        tokens.append((kind, text))
+    return tokens
+
+
+def keyword(token: tuple) -> str:
+    return token[1].upper() if token[0] == "ident" else None
+
+
+def parse_compound_identifier(tokens: list[tuple], i: int) -> tuple:
+    """
+    Returns:
+        A tuple of the path components starting at index i and the index after them, the path is empty if there is
+        no identifier at index i
+    """
+    path = []
+    while i < len(tokens) and tokens[i][0] in ("ident", "quoted"):
+        path.append(tokens[i][1])
+        i += 1
+        if i < len(tokens) - 1 and tokens[i] == ("op", "."):
+            i += 1
+        else:
+            break
+    return path, i
+
+
+def extract_table_references(sql: str) -> list[list[str]]:
+    """
+    Extract the dataset paths a query reads from, i.e. the FROM and JOIN items that are neither subqueries nor common
+    table expressions
+
+    Returns:
+        The referenced paths in order of appearance, or None if the query cannot be analyzed reliably
+
+    Examples:
+        >>> extract_table_references('SELECT * FROM "my space".f.t a JOIN s.u ON a.id = u.id, s.v WHERE x = 1')
+        [['my space', 'f', 't'], ['s', 'u'], ['s', 'v']]
+        >>> extract_table_references('WITH c AS (SELECT * FROM s.t) SELECT * FROM c JOIN s.u USING (id)')
+        [['s', 't'], ['s', 'u']]
+        >>> extract_table_references('SELECT EXTRACT(YEAR FROM d) FROM s.t WHERE a IS NOT DISTINCT FROM b.c')
+        [['s', 't']]
+        >>> extract_table_references('SELECT * FROM (SELECT * FROM s.t) q, s.u')
+        [['s', 't'], ['s', 'u']]
+        >>> extract_table_references('SELECT * FROM TABLE(s.fn(1))') is None
+        True
+        >>> extract_table_references('SELECT * FROM s.t AT BRANCH dev') is None
+        True
+    """
+    tokens = tokenize(sql)
+    if tokens is None:
+        return None
+    references = []
+    cte_names = set()
+    # Parenthesis depths at which a query, respectively a FROM list is open. A FROM inside a function call such as
+    # EXTRACT(YEAR FROM d) has no query at its depth.
+    query_depths = set()
+    from_list_depths = set()
+    depth = 0
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        word = keyword(token)
+        if token == ("op", "("):
+            depth += 1
+        elif token == ("op", ")"):
+            query_depths.discard(depth)
+            from_list_depths.discard(depth)
+            depth -= 1
+            if depth < 0:
+                return None
+        elif word == "WITH":
+            for name in parse_cte_names(tokens, i + 1):
+                cte_names.add(name.lower())
+        elif word in FROM_LIST_END_KEYWORDS:
+            from_list_depths.discard(depth)
+            if word == "SELECT":
+                query_depths.add(depth)
+        if word == "FROM" and i > 0 and keyword(tokens[i - 1]) == "DISTINCT":
+            # The IS [NOT] DISTINCT FROM comparison
+            i += 1
+            continue
+        if depth in query_depths and (word in ("FROM", "JOIN") or (token == ("op", ",") and depth in from_list_depths)):
+            if word == "FROM":
+                from_list_depths.add(depth)
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else None
+            if next_token is None or keyword(next_token) in UNSUPPORTED_FROM_KEYWORDS:
+                return None
+            if next_token != ("op", "("):
+                path, end = parse_compound_identifier(tokens, i + 1)
+                if not path:
+                    return None
+                if end < len(tokens) and (tokens[end] == ("op", "(") or keyword(tokens[end]) == "AT"):
+                    # Table functions and versioned references (AT BRANCH, AT SNAPSHOT)
+                    return None
+                if len(path) > 1 or path[0].lower() not in cte_names:
+                    references.append(path)
+                i = end
+                continue
+        i += 1
+    if depth != 0:
+        return None
+    return references
+
+
+def parse_cte_names(tokens: list[tuple], i: int) -> list[str]:
+    """
+    Collect the names of the common table expressions of a WITH clause starting at index i
+    """
+    names = []
+    if i < len(tokens) and keyword(tokens[i]) == "RECURSIVE":
+        i += 1
+    while i < len(tokens) and tokens[i][0] in ("ident", "quoted"):
+        names.append(tokens[i][1])
+        i += 1
+        if i < len(tokens) and tokens[i] == ("op", "("):
+            i = skip_parentheses(tokens, i)
+        if i >= len(tokens) or keyword(tokens[i]) != "AS":
+            break
+        i = skip_parentheses(tokens, i + 1)
+        if i >= len(tokens) or tokens[i] != ("op", ","):
+            break
+        i += 1
+    return names
+
+
+def skip_parentheses(tokens: list[tuple], i: int) -> int:
+    """
+    Returns:
+        The index after the parenthesis opened at index i, or the end of the tokens if it is not closed
+    """
+    if i >= len(tokens) or tokens[i] != ("op", "("):
+        return i
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j] == ("op", "("):
+            depth += 1
+        elif tokens[j] == ("op", ")"):
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(tokens)
+
+
+def parse_sql_context(sql_context: str) -> list[str]:
+    """
+    Split the sql_context of sys.views, e.g. Space.folder or "my space".folder, into path components
+
+    Examples:
+        >>> parse_sql_context('"my space".folder')
+        ['my space', 'folder']
+        >>> parse_sql_context('Samples."samples.dremio.com"')
+        ['Samples', 'samples.dremio.com']
+    """
+    tokens = tokenize(sql_context)
+    if tokens:
+        path, end = parse_compound_identifier(tokens, 0)
+        if end == len(tokens):
+            return path
+    return sql_context.split(".")
+
+
+class SqlLineageResolver:
+    """
+    Resolve the parents of views from their SQL against the paths of the collected catalog, case-insensitively like
+    Dremio. References are looked up below the view's SQL context first and then from the catalog root.
+    """
+
+    def __init__(self, catalog_store: CatalogStore):
+        self.datasets = {}
+        for catalog_id in catalog_store:
+            entity = catalog_store.get(catalog_id)
+            if entity.object_type in DATASET_TYPES:
+                self.add(catalog_id, entity.object_path, DATASET_TYPES[entity.object_type])
+        for parent_id, (parent_path, parent_type) in catalog_store.parents.items():
+            self.add(parent_id, parent_path, parent_type)
+
+    def add(self, catalog_id: str, path, dataset_type: str):
+        self.datasets.setdefault(tuple(p.lower() for p in path), (catalog_id, path, dataset_type))
+
+    def resolve(self, sql: str, sql_context: str) -> list[tuple]:
+        """
+        Returns:
+            The (id, path, dataset type) tuples of the parents in order of appearance, or None if a reference cannot
+            be resolved
+        """
+        references = extract_table_references(sql)
+        if not references:
+            return None
+        context = parse_sql_context(sql_context) if sql_context else []
+        parents = {}
+        for path in references:
+            candidates = [context + path, path] if context else [path]
+            for candidate in candidates:
+                dataset = self.datasets.get(tuple(p.lower() for p in candidate))
+                if dataset is not None:
+                    parents.setdefault(dataset[0], dataset)
+                    break
+            else:
+                logger.debug(f"Reference {path} could not be resolved in the catalog")
+                return None
+        return list(parents.values())
+
+
+def resolve_view_lineage(api: dremio_api.DremioAPI, catalog_store: CatalogStore, view_rows, max_workers=1):
+    """
+    Set the parents of the views whose lineage was deferred during the traversal, deriving them from the SQL
+    definitions of sys.views. Views whose SQL cannot be resolved fall back to the /graph endpoint.
+    """
+    resolver = SqlLineageResolver(catalog_store)
+    fallback = []
+    resolved = 0
+    for row in view_rows:
+        entity = catalog_store.get(row['view_id'])
+        if entity is None or entity.object_type != 'VDS' or entity.parent_ids:
+            continue
+        parents = resolver.resolve(row['sql_definition'], row['sql_context'])
+        if parents is None:
+            fallback.append(entity)
+            continue
+        catalog_store.set_parents(entity.id, parents)
+        resolved += 1
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+        lineage = executor.map(lambda e: collect_dremio_lineage(api, e.id, e.object_path), fallback)
+        for entity, parents in zip(fallback, lineage):
+            catalog_store.set_parents(entity.id, parents)
+    api.profile.increment('lineage_resolved_offline', resolved)
+    api.profile.increment('lineage_graph_fallbacks', len(fallback))
+    logger.info(f"Derived the lineage of {resolved} views from their SQL, {len(fallback)} views used the /graph endpoint")
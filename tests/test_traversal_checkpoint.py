@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+
+repo_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, repo_path)
+sys.path.insert(0, os.path.join(repo_path, 'benchmark'))
+
+import dremio_api
+from dremio_collect_catalog import TraversalCheckpoint, get_catalog_entries
+from dremio_selector import CatalogSelector
+from mock_dremio import MockDremioCatalog, MockDremioServer
+
+
+class InterruptingCheckpoint(TraversalCheckpoint):
+    """
+    Checkpoint that interrupts the traversal after the given number of processed work items, like a CI timeout
+    """
+
+    def __init__(self, filename: str, interrupt_after: int):
+        super().__init__(filename)
+        self.interrupt_after = interrupt_after
+
+    def start(self, catalog_root: dict):
+        super().start(catalog_root)
+        if self.interrupt_after == 0:
+            raise KeyboardInterrupt()
+
+    def record(self, catalog_id: str, items: list, child_work_items: list):
+        super().record(catalog_id, items, child_work_items)
+        self.interrupt_after -= 1
+        if self.interrupt_after == 0:
+            raise KeyboardInterrupt()
+
+
+class TraversalCheckpointTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockDremioServer(MockDremioCatalog(spaces=3, depth=1, fan_out=2, views_per_folder=2, tables=2)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_file = os.path.join(self.work_dir.name, 'dremio_catalog_checkpoint.ndjson')
+        self.selector = CatalogSelector()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def traverse(self, checkpoint=None, resume=False) -> list:
+        api = dremio_api.DremioAPI('pat', self.server.url, max_retries=0)
+        catalog_store = get_catalog_entries(api, self.selector, dataset_ids=set(), checkpoint=checkpoint, resume=resume)
+        return [(catalog_id, catalog_store.get(catalog_id).object_path) for catalog_id in catalog_store]
+
+    def assert_resume_completes(self, interrupt_after: int):
+        expected = self.traverse()
+        with self.assertRaises(KeyboardInterrupt):
+            self.traverse(InterruptingCheckpoint(self.checkpoint_file, interrupt_after))
+        self.assertTrue(os.path.exists(self.checkpoint_file))
+
+        self.assertEqual(self.traverse(TraversalCheckpoint(self.checkpoint_file), resume=True), expected)
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+
+    def test_resume_before_any_work_item(self):
+        self.assert_resume_completes(0)
+
+    def test_resume_with_unfinished_roots(self):
+        self.assert_resume_completes(1)
+
+    def test_resume_within_folders(self):
+        self.assert_resume_completes(5)
+
+
+if __name__ == '__main__':
+    unittest.main()